@@ -15,5 +15,21 @@ class Settings(BaseSettings):
     DB_NAME: str = "estimation.db"
     DATABASE_URL: str = "sqlite:///./estimation.db"
 
+    # Connection pool (per worker process). Each process can hold up to
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW connections, so keep
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below the server's max_connections.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800
+
+    # Worker threads for sync routes/dependencies (AnyIO defaults to 40)
+    THREADPOOL_SIZE: int = 60
+
+    # Worker processes for parsing uploaded XLSX files (per server process)
+    IMPORT_PARSE_WORKERS: int = 2
+
+    # Worker threads reserved for rendering item exports (per server process)
+    EXPORT_THREADS: int = 2
+
 
 settings = Settings()
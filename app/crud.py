@@ -1,12 +1,42 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import select, func, tuple_, delete
+from sqlalchemy.orm import Session, joinedload, selectinload, contains_eager
+from sqlalchemy import select, func, tuple_, delete, case, insert, update
 from . import models, schemas
-from sqlalchemy.exc import IntegrityError
-from .security import get_password_hash, verify_password
+from sqlalchemy.exc import IntegrityError, DBAPIError
+from .security import get_password_hash, verify_password, invalidate_cached_users
 from datetime import datetime
 from typing import List, Optional
+import hashlib
 import re
 
+def _insert_ignore(db: Session, table):
+    """INSERT that silently skips rows conflicting with a unique key already present."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(table).on_conflict_do_nothing()
+    return table.insert().prefix_with("IGNORE")
+
+def _touch_users(db: Session, *, user_id: int | None = None, role_id: int | None = None):
+    """Bump updated_at for one user, or for every holder of a role.
+
+    Cached authentications are revalidated against updated_at, so this makes
+    every worker reload the users whose roles or permissions changed.
+    """
+    # A microsecond timestamp from here, not the database clock: SQLite's CURRENT_TIMESTAMP
+    # has one-second resolution, so two changes in the same second would look like none
+    stmt = update(models.User).values(updated_at=datetime.utcnow())
+    if user_id is not None:
+        stmt = stmt.where(models.User.user_id == user_id)
+    else:
+        user_roles = models.user_roles_association
+        stmt = stmt.where(models.User.user_id.in_(
+            select(user_roles.c.user_id).where(user_roles.c.role_id == role_id)
+        ))
+    db.execute(stmt.execution_options(synchronize_session=False))
+
 # =============== User CRUD Operations ===============
 
 def create_user(db: Session, user: schemas.UserCreate) -> models.User:
@@ -34,17 +64,46 @@ def get_user_by_id(db: Session, user_id: int) -> models.User | None:
     """Get a user by ID."""
     return db.query(models.User).filter(models.User.user_id == user_id).first()
 
-def get_all_users(db: Session, skip: int = 0, limit: int = 100, search: str | None = None) -> list[models.User]:
-    """Get all users with optional search."""
-    query = db.query(models.User)
+def get_all_users(db: Session, skip: int = 0, limit: int = 100, search: str | None = None) -> list[schemas.User]:
+    """Get all users with optional search, built straight from column rows."""
+    query = select(
+        models.User.user_id,
+        models.User.username,
+        models.User.email,
+        models.User.full_name,
+        models.User.is_active,
+        models.User.created_at,
+    )
     if search:
         term = f"%{search}%"
-        query = query.filter(
+        query = query.where(
             func.lower(models.User.username).like(term.lower()) |
             func.lower(models.User.email).like(term.lower()) |
             func.lower(models.User.full_name).like(term.lower())
         )
-    return query.offset(skip).limit(limit).all()
+    rows = db.execute(query.order_by(models.User.user_id).offset(skip).limit(limit)).all()
+    if not rows:
+        return []
+
+    # One query for every listed user's roles; each role is converted once.
+    role_rows = db.execute(
+        select(models.user_roles_association.c.user_id, models.Role)
+        .join(models.Role, models.Role.role_id == models.user_roles_association.c.role_id)
+        .where(models.user_roles_association.c.user_id.in_([r.user_id for r in rows]))
+        .options(selectinload(models.Role.permissions))
+    ).all()
+    role_dtos: dict[int, schemas.Role] = {}
+    roles_by_user: dict[int, list[schemas.Role]] = {}
+    for user_id, role in role_rows:
+        dto = role_dtos.get(role.role_id)
+        if dto is None:
+            dto = role_dtos[role.role_id] = schemas.Role.model_validate(role)
+        roles_by_user.setdefault(user_id, []).append(dto)
+
+    return [
+        schemas.User.model_construct(**row._mapping, roles=roles_by_user.get(row.user_id, []))
+        for row in rows
+    ]
 
 def get_user_count(db: Session) -> int:
     return db.query(func.count(models.User.user_id)).scalar() or 0
@@ -63,6 +122,7 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate) -> m
         db_user.hashed_password = get_password_hash(user_update.password)
     
     db.commit()
+    invalidate_cached_users()
     db.refresh(db_user)
     return db_user
 
@@ -72,6 +132,7 @@ def deactivate_user(db: Session, user_id: int) -> models.User | None:
     if db_user:
         db_user.is_active = False
         db.commit()
+        invalidate_cached_users()
         db.refresh(db_user)
     return db_user
 
@@ -81,6 +142,7 @@ def activate_user(db: Session, user_id: int) -> models.User | None:
     if db_user:
         db_user.is_active = True
         db.commit()
+        invalidate_cached_users()
         db.refresh(db_user)
     return db_user
 
@@ -110,6 +172,29 @@ def get_all_roles(db: Session, skip: int = 0, limit: int = 100) -> list[models.R
     """Get all roles."""
     return db.query(models.Role).offset(skip).limit(limit).all()
 
+def _rows_digest(db: Session, *statements) -> str:
+    """md5 over the rows of each statement, in order."""
+    digest = hashlib.md5()
+    for stmt in statements:
+        for row in db.execute(stmt):
+            digest.update(repr(tuple(row)).encode())
+        digest.update(b"|")
+    return digest.hexdigest()
+
+def get_roles_fingerprint(db: Session) -> str:
+    """Change marker for the roles list: a digest of roles, permission links and the permissions they embed."""
+    Role, Permission = models.Role, models.Permission
+    role_perms = models.role_permissions_association
+    return _rows_digest(
+        db,
+        select(Role.role_id, Role.name, Role.description, Role.is_system_role, Role.created_at)
+        .order_by(Role.role_id),
+        select(role_perms.c.role_id, role_perms.c.permission_id)
+        .order_by(role_perms.c.role_id, role_perms.c.permission_id),
+        select(Permission.permission_id, Permission.name, Permission.description)
+        .order_by(Permission.permission_id),
+    )
+
 def update_role(db: Session, role_id: int, role_update: schemas.RoleUpdate) -> models.Role | None:
     """Update a role."""
     db_role = get_role_by_id(db, role_id)
@@ -121,7 +206,9 @@ def update_role(db: Session, role_id: int, role_update: schemas.RoleUpdate) -> m
     if role_update.description:
         db_role.description = role_update.description
     
+    _touch_users(db, role_id=role_id)
     db.commit()
+    invalidate_cached_users()
     db.refresh(db_role)
     return db_role
 
@@ -131,8 +218,11 @@ def delete_role(db: Session, role_id: int) -> bool:
     if not db_role or db_role.is_system_role:
         return False
     
+    # Before the delete, while the role's user links still exist
+    _touch_users(db, role_id=role_id)
     db.delete(db_role)
     db.commit()
+    invalidate_cached_users()
     return True
 
 def assign_role_to_user(db: Session, user_id: int, role_id: int) -> bool:
@@ -145,7 +235,27 @@ def assign_role_to_user(db: Session, user_id: int, role_id: int) -> bool:
     
     if db_role not in db_user.roles:
         db_user.roles.append(db_role)
+        _touch_users(db, user_id=user_id)
         db.commit()
+        invalidate_cached_users()
+    return True
+
+def assign_roles_to_user(db: Session, user_id: int, role_ids: List[int]) -> bool:
+    """Assign several roles to a user in a single insert."""
+    if get_user_by_id(db, user_id) is None:
+        return False
+    role_ids = set(role_ids)
+    found = set(db.scalars(select(models.Role.role_id).where(models.Role.role_id.in_(role_ids))))
+    if found != role_ids:
+        return False
+    if role_ids:
+        db.execute(
+            _insert_ignore(db, models.user_roles_association),
+            [{"user_id": user_id, "role_id": rid} for rid in role_ids],
+        )
+        _touch_users(db, user_id=user_id)
+        db.commit()
+        invalidate_cached_users()
     return True
 
 def remove_role_from_user(db: Session, user_id: int, role_id: int) -> bool:
@@ -158,7 +268,9 @@ def remove_role_from_user(db: Session, user_id: int, role_id: int) -> bool:
     
     if db_role in db_user.roles:
         db_user.roles.remove(db_role)
+        _touch_users(db, user_id=user_id)
         db.commit()
+        invalidate_cached_users()
     return True
 
 # =============== Permission CRUD Operations ===============
@@ -186,6 +298,15 @@ def get_all_permissions(db: Session, skip: int = 0, limit: int = 100) -> list[mo
     """Get all permissions."""
     return db.query(models.Permission).offset(skip).limit(limit).all()
 
+def get_permissions_fingerprint(db: Session) -> str:
+    """Change marker for the permissions list: a digest of every permission's values."""
+    Permission = models.Permission
+    return _rows_digest(
+        db,
+        select(Permission.permission_id, Permission.name, Permission.description)
+        .order_by(Permission.permission_id),
+    )
+
 def assign_permission_to_role(db: Session, role_id: int, permission_id: int) -> bool:
     """Assign a permission to a role."""
     db_role = get_role_by_id(db, role_id)
@@ -196,7 +317,29 @@ def assign_permission_to_role(db: Session, role_id: int, permission_id: int) ->
     
     if db_permission not in db_role.permissions:
         db_role.permissions.append(db_permission)
+        _touch_users(db, role_id=role_id)
+        db.commit()
+        invalidate_cached_users()
+    return True
+
+def assign_permissions_to_role(db: Session, role_id: int, permission_ids: List[int]) -> bool:
+    """Assign several permissions to a role in a single insert."""
+    if get_role_by_id(db, role_id) is None:
+        return False
+    permission_ids = set(permission_ids)
+    found = set(db.scalars(
+        select(models.Permission.permission_id).where(models.Permission.permission_id.in_(permission_ids))
+    ))
+    if found != permission_ids:
+        return False
+    if permission_ids:
+        db.execute(
+            _insert_ignore(db, models.role_permissions_association),
+            [{"role_id": role_id, "permission_id": pid} for pid in permission_ids],
+        )
+        _touch_users(db, role_id=role_id)
         db.commit()
+        invalidate_cached_users()
     return True
 
 def remove_permission_from_role(db: Session, role_id: int, permission_id: int) -> bool:
@@ -209,7 +352,9 @@ def remove_permission_from_role(db: Session, role_id: int, permission_id: int) -
     
     if db_permission in db_role.permissions:
         db_role.permissions.remove(db_permission)
+        _touch_users(db, role_id=role_id)
         db.commit()
+        invalidate_cached_users()
     return True
 
 # =============== Organization CRUD Operations ===============
@@ -341,6 +486,8 @@ def create_item_from_parsed_data_bulk(db: Session, item_data: schemas.ItemParsed
         # No commit here — caller handles the transaction
         return obj
 
+IMPORT_BATCH_SIZE = 1000
+
 def bulk_import_items_optimized(db: Session, items_data: list[schemas.ItemParsed], mode: str = "append"):
     """
     Optimized bulk import that minimizes DB queries by pre-fetching data.
@@ -350,45 +497,34 @@ def bulk_import_items_optimized(db: Session, items_data: list[schemas.ItemParsed
     
     # 1. Pre-fetch reference data (Organizations, Divisions, Regions)
     # ----------------------------------------------------------------
-    # Organizations
-    all_orgs = {org.name: org for org in list_organizations(db)}
-    
-    # Divisions (map name -> Division obj) - careful with duplicates across orgs if any
-    # Assuming division names are unique globally or we handle it per org
-    # Current schema: divisions are unique by name mostly.
-    # Let's fetch all divisions and map by name.
-    all_divisions = {div.name: div for div in list_divisions(db)}
-    
-    # Regions (map (org_id, name) -> Region obj)
-    all_regions = {}
-    for region in db.query(models.Region).all():
-        all_regions[(region.organization_id, region.name)] = region
+    # Only ids are needed: organization name -> org_id, division name -> division_id
+    # (division names are unique globally) and the (org_id, name) keys of regions.
+    org_ids = dict(db.execute(select(models.Organization.name, models.Organization.org_id)).all())
+    division_ids = dict(db.execute(select(models.Division.name, models.Division.division_id)).all())
+    region_keys = set(db.execute(select(models.Region.organization_id, models.Region.name)).all())
         
     # 2. Pre-fetch existing Items (always fetch for duplicate check, and tracking for replace mode)
     # ----------------------------------------------------------------
-    # Map (item_code, region, organization) -> Item obj
+    # Map (item_code, region, organization) -> item_id; only the key columns are loaded,
+    # rows are written below with bulk INSERT/UPDATE statements instead of ORM objects
     existing_items_map = {}
-    
-    # Fetch only necessary columns to build the map if memory is concern, 
-    # but we need the object to update it.
-    # Warning: loading 50k objects into session might be heavy, but better than 50k selects.
-    # We can use yield_per if needed, but for now fetch all.
-    items_query = db.query(models.Item)
-    # If too many items, this might be slow, but still faster than N queries.
-    for item in items_query.all():
-        key = (item.item_code, item.region, item.organization)
-        existing_items_map[key] = item
+    for item_id, item_code, region, organization in db.execute(
+        select(models.Item.item_id, models.Item.item_code, models.Item.region, models.Item.organization)
+    ):
+        existing_items_map[(item_code, region, organization)] = item_id
             
     # 3. Process items in memory
     # ----------------------------------------------------------------
     count = 0
     errors = []
     touched_ids = set()
+    pending_inserts = {}  # item key -> (row number, division name, column mapping)
+    pending_updates = {}  # item_id -> (row number, division name, column mapping)
     
-    # Cache for newly created reference data in this transaction
-    new_orgs = {} # name -> obj
-    new_divisions = {} # name -> obj
-    new_regions = {} # (org_id, name) -> obj
+    # Reference data missing from the DB, created in bulk once all rows are read
+    new_orgs = {}  # name -> None (ordered set)
+    new_divisions = {}  # name -> organization name of the first row using it
+    new_regions = {}  # (organization name, region name) -> None
     
     for idx, row in enumerate(items_data, 1):
         try:
@@ -403,74 +539,106 @@ def bulk_import_items_optimized(db: Session, items_data: list[schemas.ItemParsed
 
             # Organization
             org_name = row.organization or "RHD"
-            org = all_orgs.get(org_name) or new_orgs.get(org_name)
-            if not org:
-                org = models.Organization(name=org_name)
-                db.add(org)
-                db.flush() # Need ID for regions/divisions
-                all_orgs[org_name] = org
-                new_orgs[org_name] = org
+            if org_name not in org_ids:
+                new_orgs.setdefault(org_name, None)
             
             # Region
             region_name = row.region
-            if region_name:
-                reg_key = (org.org_id, region_name)
-                region = all_regions.get(reg_key) or new_regions.get(reg_key)
-                if not region:
-                    region = models.Region(name=region_name, organization_id=org.org_id)
-                    db.add(region)
-                    db.flush() # Need ID? Not really, but good to be safe
-                    all_regions[reg_key] = region
-                    new_regions[reg_key] = region
+            if region_name and (org_ids.get(org_name), region_name) not in region_keys:
+                new_regions.setdefault((org_name, region_name), None)
             
             # Division
             div_name = row.division
-            division = all_divisions.get(div_name) or new_divisions.get(div_name)
-            if not division:
-                # Create division
-                division = models.Division(name=div_name, organization_id=org.org_id)
-                db.add(division)
-                db.flush()
-                all_divisions[div_name] = division
-                new_divisions[div_name] = division
+            if div_name not in division_ids:
+                new_divisions.setdefault(div_name, org_name)
             
             # Item
             item_key = (code_clean, region_name, org_name)
-            existing_item = existing_items_map.get(item_key)
+            values = {
+                "item_description": desc_clean,
+                "unit": row.unit,
+                "rate": row.rate,
+                "organization": org_name,
+            }
+            existing_id = existing_items_map.get(item_key)
             
-            if existing_item:
-                # Update
-                existing_item.item_description = desc_clean
-                existing_item.unit = row.unit
-                existing_item.rate = row.rate
-                existing_item.division_id = division.division_id
-                existing_item.organization = org_name
-                touched_ids.add(existing_item.item_id)
-                # db.add(existing_item) # Already in session
+            if existing_id is not None:
+                # Update (a later row for the same key wins)
+                pending_updates[existing_id] = (idx, div_name, {"item_id": existing_id, **values})
+                touched_ids.add(existing_id)
             else:
-                # Create
-                new_item = models.Item(
-                    division_id=division.division_id,
-                    item_code=code_clean,
-                    item_description=desc_clean,
-                    unit=row.unit,
-                    rate=row.rate,
-                    region=region_name,
-                    organization=org_name,
-                )
-                db.add(new_item)
-                existing_items_map[item_key] = new_item # Add to map to prevent duplicates in same batch
+                # Create (keyed so duplicates in the same file collapse into one row)
+                pending_inserts[item_key] = (idx, div_name, {"item_code": code_clean, "region": region_name, **values})
             
             count += 1
             
         except Exception as e:
             errors.append(f"Row {idx}: {str(e)}")
+
+    # Create missing organizations first (regions and divisions reference them),
+    # then regions and divisions, one multi-row INSERT each. Rows another import
+    # created since the pre-fetch are skipped by the conflict clause instead of
+    # failing the import; their ids are read back with one SELECT.
+    if new_orgs:
+        org_ids.update(db.execute(
+            _insert_ignore(db, models.Organization.__table__).returning(models.Organization.name, models.Organization.org_id),
+            [{"name": name} for name in new_orgs],
+        ).all())
+        raced = [name for name in new_orgs if name not in org_ids]
+        if raced:
+            org_ids.update(db.execute(
+                select(models.Organization.name, models.Organization.org_id).where(models.Organization.name.in_(raced))
+            ).all())
+    if new_regions:
+        db.execute(
+            _insert_ignore(db, models.Region.__table__),
+            [{"name": name, "organization_id": org_ids[org_name]} for org_name, name in new_regions],
+        )
+    if new_divisions:
+        division_ids.update(db.execute(
+            _insert_ignore(db, models.Division.__table__).returning(models.Division.name, models.Division.division_id),
+            [{"name": name, "organization_id": org_ids[org_name]} for name, org_name in new_divisions.items()],
+        ).all())
+        raced = [name for name in new_divisions if name not in division_ids]
+        if raced:
+            division_ids.update(db.execute(
+                select(models.Division.name, models.Division.division_id).where(models.Division.name.in_(raced))
+            ).all())
+
+    pending_inserts = [(idx, {**mapping, "division_id": division_ids[div_name]}) for idx, div_name, mapping in pending_inserts.values()]
+    pending_updates = [(idx, {**mapping, "division_id": division_ids[div_name]}) for idx, div_name, mapping in pending_updates.values()]
+
+    # Write items in chunks: one executemany per chunk instead of a statement per row.
+    # Each chunk runs in a SAVEPOINT; if it fails, only that chunk is retried row by row
+    # so a bad row is reported and skipped without discarding the rest of the import.
+    insert_stmt = insert(models.Item).returning(models.Item.item_id)
+    update_stmt = update(models.Item)
+    failed = 0
+    for stmt, pending in ((insert_stmt, pending_inserts), (update_stmt, pending_updates)):
+        for start in range(0, len(pending), IMPORT_BATCH_SIZE):
+            chunk = pending[start:start + IMPORT_BATCH_SIZE]
+            try:
+                with db.begin_nested():
+                    result = db.execute(stmt, [mapping for _, mapping in chunk])
+            except DBAPIError:
+                for idx, mapping in chunk:
+                    try:
+                        with db.begin_nested():
+                            result = db.execute(stmt, [mapping])
+                    except DBAPIError as e:
+                        errors.append(f"Row {idx}: {e.orig}")
+                        failed += 1
+                        continue
+                    if stmt is insert_stmt:
+                        touched_ids.update(result.scalars())
+                continue
+            if stmt is insert_stmt:
+                touched_ids.update(result.scalars())
+    count -= failed
             
     # 4. Commit all changes
     # ----------------------------------------------------------------
     try:
-        db.commit()
-        
         # 5. If Replace Mode: Delete items that were not touched (and not used)
         if mode == "replace":
             # Identify items to delete: existing items NOT in touched_ids
@@ -491,9 +659,11 @@ def bulk_import_items_optimized(db: Session, items_data: list[schemas.ItemParsed
             )
             
             result = db.execute(stmt)
-            db.commit()
             # print(f"DEBUG: Deleted {result.rowcount} unused items in replace mode")
 
+        # Single commit: the upserts and the replace-mode cleanup land together
+        db.commit()
+
     except Exception as e:
         db.rollback()
         raise e
@@ -521,8 +691,14 @@ def create_division(db: Session, data: schemas.DivisionCreate):
     db.refresh(obj)
     return obj
 
-def list_divisions(db: Session):
-    return db.execute(select(models.Division)).scalars().all()
+def list_divisions(db: Session, after_id: int | None = None, limit: int | None = None):
+    """List divisions by id; after_id/limit give keyset pages instead of the whole table."""
+    stmt = select(models.Division).order_by(models.Division.division_id)
+    if after_id is not None:
+        stmt = stmt.where(models.Division.division_id > after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return db.execute(stmt).scalars().all()
 
 def delete_division(db: Session, division_id: int):
     division = db.get(models.Division, division_id)
@@ -665,8 +841,9 @@ def get_items(db: Session, region: str | None = None, organization: str | None =
     # Step 2: fetch all region rows for those pairs
     return (
         db.query(models.Item)
-        .options(joinedload(models.Item.division))
         .outerjoin(models.SpecialItem, models.Item.item_id == models.SpecialItem.item_id)
+        # The anti-join already tells us special_item is None; populate it from the join
+        .options(joinedload(models.Item.division), contains_eager(models.Item.special_item))
         .filter(models.SpecialItem.special_item_id == None)
         .filter(tuple_(models.Item.division_id, models.Item.item_code).in_(pairs))
         .order_by(order_expr, models.Item.division_id.asc(), models.Item.region.asc())
@@ -715,11 +892,43 @@ def create_item(db: Session, data: schemas.ItemCreate):
     db.refresh(obj)
     return obj
 
-def list_items(db: Session):
-    stmt = select(models.Item).options(joinedload(models.Item.division))
-    # Exclude special items
-    stmt = stmt.outerjoin(models.SpecialItem, models.Item.item_id == models.SpecialItem.item_id).filter(models.SpecialItem.special_item_id == None)
-    return db.execute(stmt).scalars().all()
+def get_items_fingerprint(db: Session) -> str:
+    """Cheap change marker for the item master export (rows, edits, and items turned special)."""
+    row = db.execute(select(
+        func.count(models.Item.item_id),
+        func.max(models.Item.item_id),
+        func.max(models.Item.updated_at),
+        func.sum(models.Item.rate),
+        select(func.count(models.SpecialItem.special_item_id)).scalar_subquery(),
+        select(func.max(models.SpecialItem.special_item_id)).scalar_subquery(),
+    )).one()
+    return "-".join(str(v) for v in row)
+
+def list_items_pivoted(db: Session, regions: List[str], aliases: dict[str, str] | None = None):
+    """Item Master rows pivoted to one rate column per region, sorted by division then item code."""
+    region = models.Item.region
+    for alias, canonical in (aliases or {}).items():
+        region = case((models.Item.region == alias, canonical), else_=region)
+    organization = func.coalesce(models.Item.organization, "RHD")
+    stmt = (
+        select(
+            models.Item.item_code,
+            func.coalesce(models.Division.name, "").label("division_name"),
+            func.coalesce(func.max(models.Item.item_description), "").label("description"),
+            func.coalesce(func.max(models.Item.unit), "").label("unit"),
+            *[func.max(case((region == r, models.Item.rate))) for r in regions],
+            organization.label("organization"),
+        )
+        .outerjoin(models.Division, models.Item.division_id == models.Division.division_id)
+        # Exclude special items
+        .outerjoin(models.SpecialItem, models.Item.item_id == models.SpecialItem.item_id)
+        .filter(models.SpecialItem.special_item_id == None)
+        .group_by(models.Item.division_id, models.Division.name, models.Item.item_code, organization)
+        .order_by(func.coalesce(models.Division.name, ""), models.Item.item_code, func.min(models.Item.item_id))
+        # Server-side cursor: rows are fetched in batches as the export consumes them
+        .execution_options(yield_per=1000)
+    )
+    return db.execute(stmt)
 
 def update_item(db: Session, item_id: int, data: schemas.ItemUpdate):
     item = db.get(models.Item, item_id)
@@ -854,6 +1063,10 @@ def delete_project(db: Session, project_id: int):
     project = db.get(models.Project, project_id)
     if not project:
         return None
+    return delete_project_obj(db, project)
+
+def delete_project_obj(db: Session, project: models.Project):
+    """Delete a project the caller has already loaded (e.g. for an ownership check)."""
     db.delete(project)
     db.commit()
     return project
@@ -869,6 +1082,10 @@ def update_project(db: Session, project_id: int, data: schemas.ProjectUpdate, us
     project = db.get(models.Project, project_id)
     if not project:
         return None
+    return update_project_obj(db, project, data, user_id)
+
+def update_project_obj(db: Session, project: models.Project, data: schemas.ProjectUpdate, user_id: int | None = None):
+    """Apply an update to a project the caller has already loaded."""
     for key, value in data.model_dump(exclude_unset=True).items():
         setattr(project, key, value)
     project.updated_by_id = user_id or project.updated_by_id
@@ -903,7 +1120,15 @@ def list_estimations_for_project(db: Session, project_id: int):
         .where(models.Estimation.project_id == project_id)
         .options(
             joinedload(models.Estimation.created_by),
-            joinedload(models.Estimation.updated_by)
+            joinedload(models.Estimation.updated_by),
+            # The response nests lines -> item -> division/special_item; load each
+            # level in one IN query instead of lazily per line.
+            selectinload(models.Estimation.lines)
+            .selectinload(models.EstimationLine.item)
+            .options(
+                selectinload(models.Item.division),
+                selectinload(models.Item.special_item).selectinload(models.SpecialItem.division),
+            ),
         )
     )
     return db.execute(stmt).scalars().all()
@@ -955,43 +1180,45 @@ def find_rate_item_by_region_alias(db: Session, item: models.Item):
             return cand
     return None
 
-def sync_estimation_line_rates(db: Session, lines: list[models.EstimationLine]):
-    updated = False
-    synced_lines = []
-    for line in lines:
-        item = line.item
-        if not item:
-            continue
-        if item.special_item:
-            synced_lines.append(line)
-            continue
-        line_rate_val = float(line.rate) if line.rate is not None else None
-        item_rate_val = float(item.rate) if item.rate is not None else None
-        if (line_rate_val is None or line_rate_val == 0) and item_rate_val and item_rate_val > 0:
-            line.rate = item_rate_val
+def _sync_line_rate(db: Session, line: models.EstimationLine) -> tuple[bool, bool]:
+    """Fill a missing line rate from its item; returns (keep_line, changed)."""
+    item = line.item
+    if not item:
+        return False, False
+    if item.special_item:
+        return True, False
+    line_rate_val = float(line.rate) if line.rate is not None else None
+    item_rate_val = float(item.rate) if item.rate is not None else None
+    if (line_rate_val is None or line_rate_val == 0) and item_rate_val and item_rate_val > 0:
+        line.rate = item_rate_val
+        line.calculated_qty = calculate_qty(
+            line.no_of_units, line.length, line.width, line.thickness, line.quantity
+        )
+        line.amount = round(line.calculated_qty * float(line.rate), 2)
+        return True, True
+    if (line_rate_val is None or line_rate_val == 0) and (not item_rate_val or item_rate_val == 0):
+        candidate = find_rate_item_by_region_alias(db, item)
+        if candidate:
+            line.item_id = candidate.item_id
+            line.item = candidate
+            line.rate = float(candidate.rate)
             line.calculated_qty = calculate_qty(
                 line.no_of_units, line.length, line.width, line.thickness, line.quantity
             )
             line.amount = round(line.calculated_qty * float(line.rate), 2)
-            updated = True
-            synced_lines.append(line)
-            continue
-        if (line_rate_val is None or line_rate_val == 0) and (not item_rate_val or item_rate_val == 0):
-            candidate = find_rate_item_by_region_alias(db, item)
-            if candidate:
-                line.item_id = candidate.item_id
-                line.item = candidate
-                line.rate = float(candidate.rate)
-                line.calculated_qty = calculate_qty(
-                    line.no_of_units, line.length, line.width, line.thickness, line.quantity
-                )
-                line.amount = round(line.calculated_qty * float(line.rate), 2)
-                updated = True
-                synced_lines.append(line)
-                continue
-        if line_rate_val and line_rate_val > 0:
+            return True, True
+    if line_rate_val and line_rate_val > 0:
+        return True, False
+    return False, False
+
+def sync_estimation_line_rates(db: Session, lines: list[models.EstimationLine]):
+    updated = False
+    synced_lines = []
+    for line in lines:
+        keep, changed = _sync_line_rate(db, line)
+        updated = updated or changed
+        if keep:
             synced_lines.append(line)
-            continue
     if updated:
         db.commit()
     return synced_lines
@@ -1007,6 +1234,27 @@ def calculate_qty(no_of_units: int | None, length, width, thickness, quantity):
             qty *= float(d)
     return qty
 
+def user_owns_estimation(db: Session, estimation_id: int, user_id: int, is_admin: bool) -> bool | None:
+    """Whether the user may modify the estimation; None if it doesn't exist."""
+    # Reads only created_by_id instead of materializing the Estimation row
+    row = db.execute(
+        select(models.Estimation.created_by_id).where(models.Estimation.estimation_id == estimation_id)
+    ).first()
+    if row is None:
+        return None
+    return is_admin or row.created_by_id == user_id
+
+def touch_estimation(db: Session, estimation_id: int, user_id: int | None = None):
+    """Bump an estimation's updated_at (and updated_by_id) without loading it."""
+    values = {"updated_at": models.utcnow()}
+    if user_id is not None:
+        values["updated_by_id"] = user_id
+    db.execute(
+        models.Estimation.__table__.update()
+        .where(models.Estimation.estimation_id == estimation_id)
+        .values(**values)
+    )
+
 def create_estimation_lines_batch(db: Session, estimation_id: int, lines_data: List[schemas.EstimationLineCreate]):
     created_lines = []
     
@@ -1056,10 +1304,7 @@ def create_estimation_lines_batch(db: Session, estimation_id: int, lines_data: L
         created_lines.append(obj)
 
     # Update parent estimation updated_at once
-    est = db.get(models.Estimation, estimation_id)
-    if est:
-        est.updated_at = datetime.utcnow()
-        db.add(est)
+    touch_estimation(db, estimation_id)
 
     db.commit()
     for l in created_lines:
@@ -1068,10 +1313,11 @@ def create_estimation_lines_batch(db: Session, estimation_id: int, lines_data: L
 
 def create_estimation_line(db: Session, estimation_id: int, data: schemas.EstimationLineCreate):
     # determine rate: prefer provided rate else item's default rate
-    line_rate = get_item_rate(db, data.item_id)
+    # (db.get reuses the item already loaded by the router when present)
+    base_item = db.get(models.Item, data.item_id)
+    line_rate = float(base_item.rate) if base_item is not None and base_item.rate is not None else None
     item_id = data.item_id
     if not line_rate or line_rate == 0:
-        base_item = db.get(models.Item, data.item_id)
         candidate = find_rate_item_by_region_alias(db, base_item)
         if candidate:
             item_id = candidate.item_id
@@ -1111,24 +1357,26 @@ def create_estimation_line(db: Session, estimation_id: int, data: schemas.Estima
     db.refresh(obj)
     return obj
 
-def delete_estimation_lines(db: Session, line_ids: list[int]):
-    # Get affected estimation IDs before deletion
-    stmt_select = select(models.EstimationLine.estimation_id).where(models.EstimationLine.line_id.in_(line_ids)).distinct()
-    estimation_ids = db.execute(stmt_select).scalars().all()
-
-    stmt = models.EstimationLine.__table__.delete().where(models.EstimationLine.line_id.in_(line_ids))
-    result = db.execute(stmt)
+def delete_estimation_lines(db: Session, line_ids: list[int]) -> list[int]:
+    """Delete lines; returns the estimation_id of every deleted line."""
+    # DELETE ... RETURNING reports the affected estimations in the same round trip
+    stmt = (
+        delete(models.EstimationLine)
+        .where(models.EstimationLine.line_id.in_(line_ids))
+        .returning(models.EstimationLine.estimation_id)
+    )
+    deleted_estimation_ids = db.execute(stmt).scalars().all()
     
     # Update updated_at for affected estimations
-    if estimation_ids:
+    if deleted_estimation_ids:
         db.execute(
             models.Estimation.__table__.update()
-            .where(models.Estimation.estimation_id.in_(estimation_ids))
-            .values(updated_at=datetime.utcnow())
+            .where(models.Estimation.estimation_id.in_(set(deleted_estimation_ids)))
+            .values(updated_at=models.utcnow())
         )
         
     db.commit()
-    return result.rowcount
+    return deleted_estimation_ids
 
 def update_estimation_line(db: Session, line_id: int, data: schemas.EstimationLineCreate):
     line = db.get(models.EstimationLine, line_id)
@@ -1202,11 +1450,7 @@ def create_special_item_request(db: Session, estimation_id: int, data: schemas.S
     db.add(obj)
 
     # Update parent estimation updated_at and updated_by_id
-    est = db.get(models.Estimation, estimation_id)
-    if est:
-        est.updated_at = datetime.utcnow()
-        est.updated_by_id = user_id
-        db.add(est)
+    touch_estimation(db, estimation_id, user_id)
 
     db.commit()
     db.refresh(obj)
@@ -1247,11 +1491,7 @@ def create_special_item_requests_batch(db: Session, estimation_id: int, requests
         objs.append(obj)
 
     # Update parent estimation updated_at and updated_by_id
-    est = db.get(models.Estimation, estimation_id)
-    if est:
-        est.updated_at = datetime.utcnow()
-        est.updated_by_id = user_id
-        db.add(est)
+    touch_estimation(db, estimation_id, user_id)
 
     db.commit()
     # Refreshing all might be expensive, just return them with IDs
@@ -1264,7 +1504,6 @@ def list_special_item_requests(db: Session, estimation_id: int | None = None, st
     query = db.query(models.SpecialItemRequest).options(
         joinedload(models.SpecialItemRequest.requested_by),
         joinedload(models.SpecialItemRequest.reviewed_by),
-        joinedload(models.SpecialItemRequest.division),
     )
     if estimation_id is not None:
         query = query.filter(models.SpecialItemRequest.estimation_id == estimation_id)
@@ -1276,7 +1515,6 @@ def list_special_item_requests_for_user(db: Session, estimation_id: int | None,
     query = db.query(models.SpecialItemRequest).options(
         joinedload(models.SpecialItemRequest.requested_by),
         joinedload(models.SpecialItemRequest.reviewed_by),
-        joinedload(models.SpecialItemRequest.division),
     ).filter(models.SpecialItemRequest.requested_by_id == user_id)
     if estimation_id is not None:
         query = query.filter(models.SpecialItemRequest.estimation_id == estimation_id)
@@ -1349,14 +1587,28 @@ def reject_special_item_request(db: Session, request_id: int, reviewer_id: int,
     db.refresh(req)
     return req
 
-def list_estimation_lines(db: Session, estimation_id: int):
-    stmt = select(models.EstimationLine).where(models.EstimationLine.estimation_id == estimation_id).options(
+def _estimation_lines_stmt(estimation_id: int):
+    return select(models.EstimationLine).where(models.EstimationLine.estimation_id == estimation_id).options(
         joinedload(models.EstimationLine.item).joinedload(models.Item.division),
         joinedload(models.EstimationLine.item).joinedload(models.Item.special_item)
     )
-    lines = db.execute(stmt).scalars().all()
+
+def list_estimation_lines(db: Session, estimation_id: int):
+    lines = db.execute(_estimation_lines_stmt(estimation_id)).scalars().all()
     return sync_estimation_line_rates(db, lines)
 
+def iter_estimation_lines(db: Session, estimation_id: int, batch_size: int = 500):
+    """Stream an estimation's synced lines, fetching batch_size rows at a time."""
+    stmt = _estimation_lines_stmt(estimation_id).order_by(models.EstimationLine.line_id)
+    updated = False
+    for line in db.execute(stmt.execution_options(yield_per=batch_size)).scalars():
+        keep, changed = _sync_line_rate(db, line)
+        updated = updated or changed
+        if keep:
+            yield line
+    if updated:
+        db.commit()
+
 def estimation_total(db: Session, estimation_id: int):
     lines = list_estimation_lines(db, estimation_id)
     return float(sum((line.amount or 0) for line in lines))
@@ -10,10 +10,22 @@ if DATABASE_URL.startswith("postgres://"):
 class Base(DeclarativeBase):
     pass
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
 
+# expire_on_commit=False: sessions are request-scoped, so objects returned after a
+# commit are serialized as-is instead of re-SELECTing every attribute
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
+    expire_on_commit=False,
     bind=engine
 )
\ No newline at end of file
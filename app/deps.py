@@ -0,0 +1,35 @@
+import hashlib
+from fastapi import Request, Response, status
+from .database import SessionLocal
+from .models import User
+
+def get_db():
+    """Get database session dependency."""
+    # Creating a Session is cheap: it only checks a connection out of the pool
+    # on its first query, so requests rejected before touching the database
+    # (missing credentials, bad token, request validation) never hold one.
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def user_role_names(user: User) -> frozenset[str]:
+    """Names of the user's roles (memoized on the user for the request)."""
+    names = getattr(user, "_role_names", None)
+    if names is None:
+        names = user._role_names = frozenset(role.name for role in (user.roles or []))
+    return names
+
+def is_admin_user(user: User) -> bool:
+    """Check if user has admin or superadmin role."""
+    return not user_role_names(user).isdisjoint(("admin", "superadmin"))
+
+def etag_headers(request: Request, fingerprint: str, cache_control: str) -> tuple[dict, Response | None]:
+    """ETag and Cache-Control headers for a fingerprint, plus a 304 response if the client already has it."""
+    etag = '"' + hashlib.md5(fingerprint.encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    client_tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in client_tags:
+        return headers, Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return headers, None
@@ -1,103 +1,120 @@
 from sqlalchemy.orm import Session
-from . import crud, schemas, models
+from . import models
+
+# Default permissions, roles and role grants. Kept at module level so the
+# literals are built once per process rather than on every init_db() call.
+DEFAULT_PERMISSIONS = [
+    # Items
+    {"name": "items:read", "description": "Read items"},
+    {"name": "items:create", "description": "Create items"},
+    {"name": "items:update", "description": "Update items"},
+    {"name": "items:delete", "description": "Delete items"},
+
+    # Projects
+    {"name": "projects:read", "description": "Read projects"},
+    {"name": "projects:create", "description": "Create projects"},
+    {"name": "projects:update", "description": "Update projects"},
+    {"name": "projects:delete", "description": "Delete projects"},
+
+    # Estimations
+    {"name": "estimations:read", "description": "Read estimations"},
+    {"name": "estimations:create", "description": "Create estimations"},
+    {"name": "estimations:update", "description": "Update estimations"},
+    {"name": "estimations:delete", "description": "Delete estimations"},
+
+    # Users
+    {"name": "users:read", "description": "Read users"},
+    {"name": "users:create", "description": "Create users"},
+    {"name": "users:update", "description": "Update users"},
+    {"name": "users:delete", "description": "Delete users"},
+    {"name": "users:activate", "description": "Activate users"},
+    {"name": "users:deactivate", "description": "Deactivate users"},
+
+    # Roles
+    {"name": "roles:read", "description": "Read roles"},
+    {"name": "roles:create", "description": "Create roles"},
+    {"name": "roles:update", "description": "Update roles"},
+    {"name": "roles:delete", "description": "Delete roles"},
+
+    # Permissions
+    {"name": "permissions:read", "description": "Read permissions"},
+    {"name": "permissions:create", "description": "Create permissions"},
+]
+
+DEFAULT_ROLES = [
+    {"name": "superadmin", "description": "Super Administrator with full access", "is_system_role": True},
+    {"name": "admin", "description": "Administrator with management access", "is_system_role": True},
+    {"name": "user", "description": "Standard User", "is_system_role": True},
+]
+
+# Admin gets everything except these, to distinguish it from Superadmin
+ADMIN_EXCLUDED_PERMISSIONS = frozenset({"roles:delete", "permissions:create"})
+
+# User: Basic access
+USER_PERMISSIONS = [
+    "items:read",
+    "projects:read", "projects:create", "projects:update", "projects:delete",
+    "estimations:read", "estimations:create", "estimations:update", "estimations:delete"
+]
 
 def init_db(db: Session):
     """
     Initialize the database with default roles and permissions.
     """
-    # 1. Define Permissions
-    permissions_list = [
-        # Items
-        {"name": "items:read", "description": "Read items"},
-        {"name": "items:create", "description": "Create items"},
-        {"name": "items:update", "description": "Update items"},
-        {"name": "items:delete", "description": "Delete items"},
-        
-        # Projects
-        {"name": "projects:read", "description": "Read projects"},
-        {"name": "projects:create", "description": "Create projects"},
-        {"name": "projects:update", "description": "Update projects"},
-        {"name": "projects:delete", "description": "Delete projects"},
-        
-        # Estimations
-        {"name": "estimations:read", "description": "Read estimations"},
-        {"name": "estimations:create", "description": "Create estimations"},
-        {"name": "estimations:update", "description": "Update estimations"},
-        {"name": "estimations:delete", "description": "Delete estimations"},
-        
-        # Users
-        {"name": "users:read", "description": "Read users"},
-        {"name": "users:create", "description": "Create users"},
-        {"name": "users:update", "description": "Update users"},
-        {"name": "users:delete", "description": "Delete users"},
-        {"name": "users:activate", "description": "Activate users"},
-        {"name": "users:deactivate", "description": "Deactivate users"},
-        
-        # Roles
-        {"name": "roles:read", "description": "Read roles"},
-        {"name": "roles:create", "description": "Create roles"},
-        {"name": "roles:update", "description": "Update roles"},
-        {"name": "roles:delete", "description": "Delete roles"},
-        
-        # Permissions
-        {"name": "permissions:read", "description": "Read permissions"},
-        {"name": "permissions:create", "description": "Create permissions"},
-    ]
-    
-    # Create Permissions
+    # 1. Create Permissions
+    # All existing permissions are loaded in one query (superadmin is granted
+    # every one of them, including ones created through the API); missing
+    # defaults are added together and flushed once (a single executemany
+    # INSERT) instead of one lookup + INSERT + COMMIT per permission.
+    existing_permissions = {perm.name: perm for perm in db.query(models.Permission)}
     created_permissions = {}
-    for perm_data in permissions_list:
-        existing_perm = crud.get_permission_by_name(db, perm_data["name"])
+    new_permissions = []
+    for perm_data in DEFAULT_PERMISSIONS:
+        existing_perm = existing_permissions.get(perm_data["name"])
         if not existing_perm:
-            new_perm = crud.create_permission(db, schemas.PermissionCreate(**perm_data))
-            created_permissions[perm_data["name"]] = new_perm
-        else:
-            created_permissions[perm_data["name"]] = existing_perm
+            existing_perm = models.Permission(**perm_data)
+            new_permissions.append(existing_perm)
+        created_permissions[perm_data["name"]] = existing_perm
+    if new_permissions:
+        db.add_all(new_permissions)
+        db.flush()
 
-    # 2. Define Roles
-    roles_list = [
-        {"name": "superadmin", "description": "Super Administrator with full access", "is_system_role": True},
-        {"name": "admin", "description": "Administrator with management access", "is_system_role": True},
-        {"name": "user", "description": "Standard User", "is_system_role": True},
-    ]
-    
-    created_roles = {}
-    for role_data in roles_list:
-        existing_role = crud.get_role_by_name(db, role_data["name"])
+    # 2. Create Roles
+    created_roles = {
+        role.name: role
+        for role in db.query(models.Role).filter(
+            models.Role.name.in_([r["name"] for r in DEFAULT_ROLES])
+        )
+    }
+    new_roles = []
+    for role_data in DEFAULT_ROLES:
+        existing_role = created_roles.get(role_data["name"])
         if not existing_role:
-            new_role = crud.create_role(
-                db, 
-                schemas.RoleCreate(name=role_data["name"], description=role_data["description"]),
-                is_system_role=role_data["is_system_role"]
-            )
-            created_roles[role_data["name"]] = new_role
-        else:
-            created_roles[role_data["name"]] = existing_role
+            existing_role = models.Role(**role_data)
+            new_roles.append(existing_role)
+        created_roles[role_data["name"]] = existing_role
+    if new_roles:
+        db.add_all(new_roles)
+        db.flush()
 
     # 3. Assign Permissions to Roles
     
     # Superadmin: All permissions
     superadmin_role = created_roles["superadmin"]
-    for perm_name, perm in created_permissions.items():
+    for perm in [*existing_permissions.values(), *new_permissions]:
         if perm not in superadmin_role.permissions:
             superadmin_role.permissions.append(perm)
     
-    # Admin: All except maybe some high-level system stuff? 
-    # For now, let's give Admin everything except roles:delete and permissions:create to distinguish from Superadmin
+    # Admin: All except ADMIN_EXCLUDED_PERMISSIONS
     admin_role = created_roles["admin"]
     for perm_name, perm in created_permissions.items():
-        if perm_name not in ["roles:delete", "permissions:create"]:
+        if perm_name not in ADMIN_EXCLUDED_PERMISSIONS:
              if perm not in admin_role.permissions:
                 admin_role.permissions.append(perm)
 
     # User: Basic access
     user_role = created_roles["user"]
-    user_perms = [
-        "items:read", 
-        "projects:read", "projects:create", "projects:update", "projects:delete",
-        "estimations:read", "estimations:create", "estimations:update", "estimations:delete"
-    ]
-    for perm_name in user_perms:
+    for perm_name in USER_PERMISSIONS:
         perm = created_permissions.get(perm_name)
         if perm and perm not in user_role.permissions:
             user_role.permissions.append(perm)
@@ -1,16 +1,19 @@
+from contextlib import asynccontextmanager
+import anyio.to_thread
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
+from .config import settings
 from .database import Base, engine, SessionLocal
 from sqlalchemy import inspect, text
 from .routers import items, projects, estimations, divisions, organizations, auth
-from . import crud, schemas
+from . import crud
 from .initial_data import init_db
+import logging
 import os
 from dotenv import load_dotenv
-from alembic.config import Config
-from alembic import command
-from pathlib import Path
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -47,9 +50,17 @@ try:
             WHERE NOT EXISTS (SELECT 1 FROM organizations WHERE name = 'LGED')
         """))
 except Exception as e:
-    print(f"Note: Organizations initialization - {str(e)[:80]}")
+    logger.warning("Organizations initialization - %s", str(e)[:80])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync routes and the DB session dependency run on AnyIO worker threads;
+    # size that pool from settings instead of AnyIO's default of 40.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    yield
+    items.shutdown_parse_pool()
 
-app = FastAPI(title="Estimation Backend", version="1.0.0")
+app = FastAPI(title="Estimation Backend", version="1.0.0", lifespan=lifespan)
 
 # CORS: cannot use "*" when allow_credentials=True.
 # Explicitly list frontend origins and allow Netlify deploy previews via regex.
@@ -92,71 +103,6 @@ app.include_router(estimations.router)
 app.include_router(divisions.router)
 app.include_router(organizations.router)
 
-# Initialize system roles and permissions
-def init_system_roles_and_permissions():
-    """Initialize default system roles and permissions."""
-    try:
-        from .security import get_db as get_db_session
-        db = next(get_db_session())
-        
-        # Create system roles if they don't exist
-        system_roles = ["superadmin", "admin", "user"]
-        for role_name in system_roles:
-            existing_role = crud.get_role_by_name(db, role_name)
-            if not existing_role:
-                crud.create_role(
-                    db,
-                    schemas.RoleCreate(
-                        name=role_name,
-                        description=f"System {role_name} role"
-                    ),
-                    is_system_role=True
-                )
-        
-        # Create default permissions if they don't exist
-        permissions = [
-            ("read:items", "Read items"),
-            ("create:items", "Create items"),
-            ("update:items", "Update items"),
-            ("delete:items", "Delete items"),
-            ("read:projects", "Read projects"),
-            ("create:projects", "Create projects"),
-            ("update:projects", "Update projects"),
-            ("delete:projects", "Delete projects"),
-            ("read:estimations", "Read estimations"),
-            ("create:estimations", "Create estimations"),
-            ("update:estimations", "Update estimations"),
-            ("delete:estimations", "Delete estimations"),
-            ("manage:users", "Manage users"),
-            ("manage:roles", "Manage roles"),
-            ("manage:permissions", "Manage permissions"),
-        ]
-        
-        for perm_name, perm_desc in permissions:
-            existing = crud.get_permission_by_name(db, perm_name)
-            if not existing:
-                crud.create_permission(
-                    db,
-                    schemas.PermissionCreate(
-                        name=perm_name,
-                        description=perm_desc
-                    )
-                )
-        
-        # Assign permissions to superadmin role
-        superadmin_role = crud.get_role_by_name(db, "superadmin")
-        if superadmin_role:
-            all_permissions = crud.get_all_permissions(db, limit=1000)
-            for perm in all_permissions:
-                if perm not in superadmin_role.permissions:
-                    crud.assign_permission_to_role(db, superadmin_role.role_id, perm.permission_id)
-        
-        db.close()
-        print("[OK] System roles and permissions initialized successfully")
-    except Exception as e:
-        print(f"Warning: Could not initialize system roles - {e}")
-        pass
-
 def ensure_admin_user():
     try:
         from .security import get_db as get_db_session
@@ -170,12 +116,11 @@ def ensure_admin_user():
                 crud.assign_role_to_user(db, user.user_id, admin_role.role_id)
         db.close()
     except Exception as e:
-        print(f"Warning: Could not ensure admin user info - {e}")
+        logger.warning("Could not ensure admin user info - %s", e)
         pass
 
-# Initialize system roles on startup
+# Default roles and permissions are seeded by init_db() above
 try:
-    init_system_roles_and_permissions()
     ensure_admin_user()
 except Exception as e:
-    print(f"[ERROR] Initialization failed: {e}")
+    logger.error("Initialization failed: %s", e)
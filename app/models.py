@@ -1,8 +1,23 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Text, UniqueConstraint, Boolean, DateTime, Table
+from sqlalchemy import Column, Integer, String, ForeignKey, Numeric, Text, UniqueConstraint, Boolean, DateTime, Table, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from .database import Base
 from datetime import datetime
 
+class utcnow(FunctionElement):
+    """Current UTC timestamp, evaluated by the database."""
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+@compiles(utcnow, "postgresql")
+def _utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
 # Association table for User-Role many-to-many relationship
 user_roles_association = Table(
     'user_roles',
@@ -33,7 +48,7 @@ class Role(Base):
     name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
     description: Mapped[str | None] = mapped_column(String(255), nullable=True)
     is_system_role: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), nullable=False)
     
     users = relationship("User", secondary=user_roles_association, back_populates="roles")
     permissions = relationship("Permission", secondary=role_permissions_association, back_populates="roles")
@@ -46,8 +61,8 @@ class User(Base):
     full_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), onupdate=utcnow(), nullable=False)
     
     roles = relationship("Role", secondary=user_roles_association, back_populates="users")
 
@@ -93,6 +108,8 @@ class Item(Base):
     region: Mapped[str] = mapped_column(String(50), nullable=False, server_default="Default")
     # Organization owning the rate; default to 'RHD'
     organization: Mapped[str] = mapped_column(String(50), nullable=False, server_default="RHD")
+    # Bumped on every change; MAX(updated_at) is the item master's change marker for exports
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), onupdate=utcnow(), nullable=False)
 
     division = relationship("Division", back_populates="items")
     # historical relationships from earlier design not strictly required
@@ -101,6 +118,13 @@ class Item(Base):
 
     __table_args__ = (
         UniqueConstraint("item_code", "region", "organization", name="uq_item_code_region_org"),
+        # Created by migration 002; the composite one serves the export pivot's
+        # GROUP BY division_id, item_code, organization
+        Index("idx_items_organization", "organization"),
+        Index("idx_items_region", "region"),
+        Index("idx_items_division_id", "division_id"),
+        Index("idx_items_division_code_org", "division_id", "item_code", "organization"),
+        Index("idx_items_updated_at", "updated_at"),
     )
 
 class SpecialItem(Base):
@@ -114,11 +138,17 @@ class SpecialItem(Base):
     rate: Mapped[float | None] = mapped_column(Numeric(15, 2), nullable=True)
     region: Mapped[str] = mapped_column(String(50), nullable=False, server_default="Default")
     organization: Mapped[str] = mapped_column(String(50), nullable=False, server_default="RHD")
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), nullable=False)
 
     division = relationship("Division", back_populates="special_items")
     item = relationship("Item", back_populates="special_item")
 
+    __table_args__ = (
+        # Created by migration 002
+        Index("idx_special_items_organization", "organization"),
+        Index("idx_special_items_region", "region"),
+    )
+
 class Project(Base):
     __tablename__ = "projects"
     project_id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -126,8 +156,8 @@ class Project(Base):
     client_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     created_by_id: Mapped[int | None] = mapped_column(ForeignKey("users.user_id"), nullable=True)
     updated_by_id: Mapped[int | None] = mapped_column(ForeignKey("users.user_id"), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), onupdate=utcnow(), nullable=False)
 
     estimations = relationship("Estimation", back_populates="project", cascade="all, delete-orphan")
     created_by = relationship("User", foreign_keys=[created_by_id])
@@ -140,14 +170,20 @@ class Estimation(Base):
     estimation_name: Mapped[str] = mapped_column(String(255), nullable=False)
     created_by_id: Mapped[int | None] = mapped_column(ForeignKey("users.user_id"), nullable=True)
     updated_by_id: Mapped[int | None] = mapped_column(ForeignKey("users.user_id"), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), onupdate=utcnow(), nullable=False)
 
     project = relationship("Project", back_populates="estimations")
     lines = relationship("EstimationLine", back_populates="estimation", cascade="all, delete-orphan")
     created_by = relationship("User", foreign_keys=[created_by_id])
     updated_by = relationship("User", foreign_keys=[updated_by_id])
 
+    __table_args__ = (
+        # Created by migration 004
+        Index("idx_estimations_project_id", "project_id"),
+        Index("idx_estimations_created_by_id", "created_by_id"),
+    )
+
 class EstimationLine(Base):
     __tablename__ = "estimation_lines"
     line_id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -174,6 +210,11 @@ class EstimationLine(Base):
     estimation = relationship("Estimation", back_populates="lines")
     item = relationship("Item", back_populates="estimation_lines")
 
+    __table_args__ = (
+        # Created by migration 004
+        Index("idx_estimation_lines_estimation_id", "estimation_id"),
+    )
+
 class SpecialItemRequest(Base):
     __tablename__ = "special_item_requests"
     request_id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -204,7 +245,7 @@ class SpecialItemRequest(Base):
     item_id: Mapped[int | None] = mapped_column(ForeignKey("items.item_id"), nullable=True)
     special_item_id: Mapped[int | None] = mapped_column(ForeignKey("special_items.special_item_id"), nullable=True)
     line_id: Mapped[int | None] = mapped_column(ForeignKey("estimation_lines.line_id"), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), nullable=False)
     reviewed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     estimation = relationship("Estimation")
@@ -214,3 +255,9 @@ class SpecialItemRequest(Base):
     item = relationship("Item")
     special_item = relationship("SpecialItem")
     line = relationship("EstimationLine")
+
+    __table_args__ = (
+        # Created by migration 004
+        Index("idx_special_item_requests_estimation_status", "estimation_id", "status"),
+        Index("idx_special_item_requests_requested_by_status", "requested_by_id", "status"),
+    )
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from .. import crud, schemas, models
+from ..deps import etag_headers
 from ..security import (
     verify_password,
     create_access_token,
@@ -19,140 +20,126 @@ logger.setLevel(logging.DEBUG)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+LIST_CACHE_CONTROL = "private, max-age=30"
+
+def _not_modified(request: Request, response: Response, fingerprint: str) -> Response | None:
+    """Tag a list response with an ETag; return a 304 if the client already has it."""
+    headers, not_modified = etag_headers(request, fingerprint, LIST_CACHE_CONTROL)
+    response.headers.update(headers)
+    return not_modified
+
 @router.post("/register", response_model=schemas.Token)
 def register(user: schemas.RegisterRequest, db: Session = Depends(get_db)):
     """Register a new user."""
-    try:
-        logger.info(f"Registration attempt for username: {user.username}, email: {user.email}")
-        
-        # Check if username already exists
-        existing_user = crud.get_user_by_username(db, user.username)
-        if existing_user:
-            logger.warning(f"Username already exists: {user.username}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already exists"
-            )
-        
-        # Check if email already exists
-        existing_email = crud.get_user_by_email(db, user.email)
-        if existing_email:
-            logger.warning(f"Email already exists: {user.email}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already exists"
-            )
-        
-        is_first_user = crud.get_user_count(db) == 0
-
-        # Create the user
-        db_user = crud.create_user(db, user)
-        logger.info(f"User created successfully: {db_user.username} (ID: {db_user.user_id})")
-        
-        role_name = "superadmin" if is_first_user else "user"
-        role_description = f"System {role_name} role"
-
-        user_role = crud.get_role_by_name(db, role_name)
-        if not user_role:
-            user_role = crud.create_role(
-                db,
-                schemas.RoleCreate(name=role_name, description=role_description),
-                is_system_role=True
-            )
-            logger.info(f"Created default '{role_name}' role")
-        
-        crud.assign_role_to_user(db, db_user.user_id, user_role.role_id)
-        logger.info(f"Assigned '{role_name}' role to {db_user.username}")
-        
-        # Refresh to get roles
-        db.refresh(db_user)
-        
-        # Create access token
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": db_user.username, "user_id": db_user.user_id},
-            expires_delta=access_token_expires
+    logger.info(f"Registration attempt for username: {user.username}, email: {user.email}")
+    
+    # Check if username already exists
+    existing_user = crud.get_user_by_username(db, user.username)
+    if existing_user:
+        logger.warning(f"Username already exists: {user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already exists"
         )
-        
-        logger.info(f"Registration successful for {db_user.username}")
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": db_user
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        logger.error(f"Registration error: {error_details}")
+    
+    # Check if email already exists
+    existing_email = crud.get_user_by_email(db, user.email)
+    if existing_email:
+        logger.warning(f"Email already exists: {user.email}")
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Registration failed: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already exists"
         )
+    
+    is_first_user = crud.get_user_count(db) == 0
+
+    # Create the user
+    db_user = crud.create_user(db, user)
+    logger.info(f"User created successfully: {db_user.username} (ID: {db_user.user_id})")
+    
+    role_name = "superadmin" if is_first_user else "user"
+    role_description = f"System {role_name} role"
+
+    user_role = crud.get_role_by_name(db, role_name)
+    if not user_role:
+        user_role = crud.create_role(
+            db,
+            schemas.RoleCreate(name=role_name, description=role_description),
+            is_system_role=True
+        )
+        logger.info(f"Created default '{role_name}' role")
+    
+    crud.assign_role_to_user(db, db_user.user_id, user_role.role_id)
+    logger.info(f"Assigned '{role_name}' role to {db_user.username}")
+    
+    # Refresh to get roles
+    db.refresh(db_user)
+    
+    # Create access token
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": db_user.username, "user_id": db_user.user_id},
+        expires_delta=access_token_expires
+    )
+    
+    logger.info(f"Registration successful for {db_user.username}")
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": db_user
+    }
 
 from fastapi.security import OAuth2PasswordRequestForm
 
 @router.post("/login", response_model=schemas.Token)
 def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Authenticate user and return access token."""
-    try:
-        logger.info(f"Login attempt for: {form_data.username}")
-        
-        # Try to find user by username
-        db_user = crud.get_user_by_username(db, form_data.username)
-        
-        # If not found by username, try by email
-        if not db_user:
-            db_user = crud.get_user_by_email(db, form_data.username)
-        
-        if not db_user:
-            logger.warning(f"User not found: {form_data.username}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        # Verify password
-        if not verify_password(form_data.password, db_user.hashed_password):
-            logger.warning(f"Password verification failed for user: {db_user.username}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        if not db_user.is_active:
-            logger.warning(f"Inactive user login attempt: {db_user.username}")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="User is inactive"
-            )
-        
-        # Create access token
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": db_user.username, "user_id": db_user.user_id},
-            expires_delta=access_token_expires
+    logger.info(f"Login attempt for: {form_data.username}")
+    
+    # Try to find user by username
+    db_user = crud.get_user_by_username(db, form_data.username)
+    
+    # If not found by username, try by email
+    if not db_user:
+        db_user = crud.get_user_by_email(db, form_data.username)
+    
+    if not db_user:
+        logger.warning(f"User not found: {form_data.username}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Verify password
+    if not verify_password(form_data.password, db_user.hashed_password):
+        logger.warning(f"Password verification failed for user: {db_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        
-        logger.info(f"Login successful for user: {db_user.username}")
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": db_user
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        logger.error(f"Login error: {error_details}")
+    
+    if not db_user.is_active:
+        logger.warning(f"Inactive user login attempt: {db_user.username}")
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Login failed: {str(e)}"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is inactive"
         )
+    
+    # Create access token
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": db_user.username, "user_id": db_user.user_id},
+        expires_delta=access_token_expires
+    )
+    
+    logger.info(f"Login successful for user: {db_user.username}")
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": db_user
+    }
 
 @router.get("/me", response_model=schemas.User)
 def get_current_user_info(current_user: models.User = Depends(get_current_user)):
@@ -298,12 +285,17 @@ def create_new_role(
 
 @router.get("/roles", response_model=list[schemas.Role])
 def list_all_roles(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user: models.User = Depends(is_admin),
     db: Session = Depends(get_db)
 ):
     """List all roles (admin/superadmin only)."""
+    not_modified = _not_modified(request, response, f"{crud.get_roles_fingerprint(db)}-{skip}-{limit}")
+    if not_modified:
+        return not_modified
     return crud.get_all_roles(db, skip=skip, limit=limit)
 
 @router.get("/roles/{role_id}", response_model=schemas.Role)
@@ -369,6 +361,22 @@ def assign_role_to_user_endpoint(
         )
     return {"message": "Role assigned successfully"}
 
+@router.post("/users/{user_id}/roles")
+def assign_roles_to_user_endpoint(
+    user_id: int,
+    payload: schemas.UserRolesAssign,
+    current_user: models.User = Depends(is_admin),
+    db: Session = Depends(get_db)
+):
+    """Assign several roles to a user (admin/superadmin only)."""
+    success = crud.assign_roles_to_user(db, user_id, payload.role_ids)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User or role not found"
+        )
+    return {"message": "Roles assigned successfully"}
+
 @router.delete("/users/{user_id}/roles/{role_id}")
 def remove_role_from_user_endpoint(
     user_id: int,
@@ -406,12 +414,17 @@ def create_new_permission(
 
 @router.get("/permissions", response_model=list[schemas.Permission])
 def list_all_permissions(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user: models.User = Depends(is_superadmin),
     db: Session = Depends(get_db)
 ):
     """List all permissions (superadmin only)."""
+    not_modified = _not_modified(request, response, f"{crud.get_permissions_fingerprint(db)}-{skip}-{limit}")
+    if not_modified:
+        return not_modified
     return crud.get_all_permissions(db, skip=skip, limit=limit)
 
 @router.post("/roles/{role_id}/permissions/{permission_id}")
@@ -430,6 +443,22 @@ def assign_permission_to_role_endpoint(
         )
     return {"message": "Permission assigned successfully"}
 
+@router.post("/roles/{role_id}/permissions")
+def assign_permissions_to_role_endpoint(
+    role_id: int,
+    payload: schemas.RolePermissionsAssign,
+    current_user: models.User = Depends(is_superadmin),
+    db: Session = Depends(get_db)
+):
+    """Assign several permissions to a role (superadmin only)."""
+    success = crud.assign_permissions_to_role(db, role_id, payload.permission_ids)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Role or permission not found"
+        )
+    return {"message": "Permissions assigned successfully"}
+
 @router.delete("/roles/{role_id}/permissions/{permission_id}")
 def remove_permission_from_role_endpoint(
     role_id: int,
@@ -1,18 +1,11 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from .. import crud, schemas, models
-from ..database import SessionLocal
+from ..deps import get_db
 from ..security import get_current_user, check_permission
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/divisions/", response_model=list[schemas.Division])
 def read_divisions(
     skip: int = 0, 
@@ -1,101 +1,130 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from typing import List, Dict, Any
-import io
-import csv
-from ..database import SessionLocal
+from sqlalchemy import select, func
+from typing import List
+import threading
+from cachetools import TTLCache
 from .. import schemas, crud, models
-from ..security import get_current_user, check_permission, is_admin_user
+from ..deps import get_db, is_admin_user
+from ..security import get_current_user, check_permission
 
 router = APIRouter(prefix="/estimations", tags=["Estimation Lines"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def is_admin_user(user: models.User) -> bool:
-    return any(r.name in ("admin", "superadmin") for r in (user.roles or []))
+# Shared dependency objects: FastAPI caches dependency results per request by
+# callable, so reusing one instance runs each check at most once.
+EST_READ = check_permission("estimations:read")
+EST_UPDATE = check_permission("estimations:update")
+EST_DELETE = check_permission("estimations:delete")
+
+# Short-lived per-process cache of estimation totals; mutations below drop the
+# affected entry and the TTL bounds staleness from other workers or rate edits.
+_totals_cache: TTLCache = TTLCache(maxsize=10_000, ttl=15)
+_totals_lock = threading.Lock()
+# Bumped by every invalidation; get_total only stores a total computed while it
+# stayed unchanged, so a total read before a concurrent edit is never cached after it
+_totals_generation = 0
+
+def invalidate_total(estimation_id: int) -> None:
+    """Forget the cached total for one estimation."""
+    global _totals_generation
+    with _totals_lock:
+        _totals_cache.pop(estimation_id, None)
+        _totals_generation += 1
+
+def get_owned_estimation(permission_dependency, action: str = "modify", load: bool = True):
+    """Dependency verifying permission and ownership of the path estimation.
+
+    Returns the loaded estimation, or None with load=False for handlers that only
+    need the check (then only created_by_id is read).
+    """
+    def dependency(
+        estimation_id: int,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(permission_dependency)
+    ) -> models.Estimation | None:
+        is_admin = is_admin_user(current_user)
+        est = None
+        if load:
+            est = db.get(models.Estimation, estimation_id)
+            owns = None if est is None else is_admin or est.created_by_id == current_user.user_id
+        else:
+            owns = crud.user_owns_estimation(db, estimation_id, current_user.user_id, is_admin)
+        if owns is None:
+            raise HTTPException(status_code=404, detail="Estimation not found")
+        if not owns:
+            raise HTTPException(status_code=403, detail=f"Not authorized to {action} this estimation")
+        return est
+
+    return dependency
+
+OWNER_FOR_UPDATE = get_owned_estimation(EST_UPDATE, load=False)
+OWNED_FOR_PATCH = get_owned_estimation(EST_UPDATE, action="update")
+OWNED_FOR_DELETE = get_owned_estimation(EST_DELETE, action="delete")
 
 @router.get("/special-item-requests/all", response_model=List[schemas.SpecialItemRequest])
 def list_all_special_item_requests(
     status: str | None = None,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:read"))
+    current_user: models.User = Depends(EST_READ)
 ):
     if is_admin_user(current_user):
         return crud.list_special_item_requests(db, estimation_id=None, status=status)
     return crud.list_special_item_requests_for_user(db, estimation_id=None, user_id=current_user.user_id, status=status)
 
-@router.post("/{estimation_id}/lines/batch", response_model=List[schemas.EstimationLine])
+@router.post("/{estimation_id}/lines/batch", response_model=List[schemas.EstimationLine], dependencies=[Depends(OWNER_FOR_UPDATE)])
 def add_lines_batch(
     estimation_id: int,
     payload: schemas.EstimationLineCreateBatch,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    db: Session = Depends(get_db)
 ):
-    est = db.get(models.Estimation, estimation_id)
-    if not est:
-        raise HTTPException(status_code=404, detail="Estimation not found")
-    
-    if est.created_by_id != current_user.user_id and not is_admin_user(current_user):
-        raise HTTPException(status_code=403, detail="Not authorized to modify this estimation")
-
-    return crud.create_estimation_lines_batch(db, estimation_id, payload.lines)
+    lines = crud.create_estimation_lines_batch(db, estimation_id, payload.lines)
+    invalidate_total(estimation_id)
+    return lines
 
 @router.post("/{estimation_id}/lines", response_model=schemas.EstimationLine)
 def add_line(
     estimation_id: int, 
     payload: schemas.EstimationLineCreate, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE)
 ):
-    est = db.get(models.Estimation, estimation_id)
-    if not est:
+    # Fetch the estimation and the item in one round trip; the outer join
+    # leaves item as None when it doesn't exist.
+    row = db.execute(
+        select(models.Estimation, models.Item)
+        .outerjoin(models.Item, models.Item.item_id == payload.item_id)
+        .where(models.Estimation.estimation_id == estimation_id)
+    ).one_or_none()
+    if row is None:
         raise HTTPException(status_code=404, detail="Estimation not found")
+    est, item = row
     
     if est.created_by_id != current_user.user_id and not is_admin_user(current_user):
         raise HTTPException(status_code=403, detail="Not authorized to modify this estimation")
 
-    item = db.get(models.Item, payload.item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    return crud.create_estimation_line(db, estimation_id, payload)
+    line = crud.create_estimation_line(db, estimation_id, payload)
+    invalidate_total(estimation_id)
+    return line
 
-@router.post("/{estimation_id}/special-item-requests", response_model=schemas.SpecialItemRequest)
+@router.post("/{estimation_id}/special-item-requests", response_model=schemas.SpecialItemRequest, dependencies=[Depends(OWNER_FOR_UPDATE)])
 def create_special_item_request(
     estimation_id: int,
     payload: schemas.SpecialItemRequestCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE)
 ):
-    est = db.get(models.Estimation, estimation_id)
-    if not est:
-        raise HTTPException(status_code=404, detail="Estimation not found")
-    
-    if est.created_by_id != current_user.user_id and not is_admin_user(current_user):
-        raise HTTPException(status_code=403, detail="Not authorized to modify this estimation")
-
     return crud.create_special_item_request(db, estimation_id, payload, current_user.user_id)
 
-@router.post("/{estimation_id}/special-item-requests/batch", response_model=List[schemas.SpecialItemRequest])
+@router.post("/{estimation_id}/special-item-requests/batch", response_model=List[schemas.SpecialItemRequest], dependencies=[Depends(OWNER_FOR_UPDATE)])
 def create_special_item_requests_batch(
     estimation_id: int,
     payload: schemas.SpecialItemRequestCreateBatch,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE)
 ):
-    est = db.get(models.Estimation, estimation_id)
-    if not est:
-        raise HTTPException(status_code=404, detail="Estimation not found")
-    
-    if est.created_by_id != current_user.user_id and not is_admin_user(current_user):
-        raise HTTPException(status_code=403, detail="Not authorized to modify this estimation")
-
     return crud.create_special_item_requests_batch(db, estimation_id, payload.requests, current_user.user_id)
 
 @router.get("/{estimation_id}/special-item-requests", response_model=List[schemas.SpecialItemRequest])
@@ -103,7 +132,7 @@ def list_special_item_requests(
     estimation_id: int,
     status: str | None = None,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:read"))
+    current_user: models.User = Depends(EST_READ)
 ):
     if is_admin_user(current_user):
         return crud.list_special_item_requests(db, estimation_id=estimation_id, status=status)
@@ -113,13 +142,14 @@ def list_special_item_requests(
 def approve_special_item_request(
     request_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE)
 ):
     if not is_admin_user(current_user):
         raise HTTPException(status_code=403, detail="Admin access required")
     req = crud.approve_special_item_request(db, request_id, current_user.user_id)
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
+    invalidate_total(req.estimation_id)
     return req
 
 @router.post("/special-item-requests/{request_id}/reject", response_model=schemas.SpecialItemRequest)
@@ -127,7 +157,7 @@ def reject_special_item_request(
     request_id: int,
     payload: schemas.SpecialItemRequestReject,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE)
 ):
     if not is_admin_user(current_user):
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -136,95 +166,119 @@ def reject_special_item_request(
         raise HTTPException(status_code=404, detail="Request not found")
     return req
 
-@router.delete("/lines")
+@router.delete("/lines", response_model=schemas.Message)
 def delete_lines(
     payload: schemas.EstimationLineDelete, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE)
 ):
-    if not payload.line_ids:
-        return {"message": "No lines to delete."}
-
-    # Verify ownership of all lines
-    stmt = select(models.EstimationLine.estimation_id).where(models.EstimationLine.line_id.in_(payload.line_ids)).distinct()
-    estimation_ids = db.execute(stmt).scalars().all()
-
-    if not estimation_ids:
-         # Lines don't exist, so nothing to delete.
-         return {"message": "0 lines deleted successfully."}
-
-    for est_id in estimation_ids:
-        est = db.get(models.Estimation, est_id)
-        if est and est.created_by_id != current_user.user_id and not is_admin_user(current_user):
-             raise HTTPException(status_code=403, detail="Not authorized to modify this estimation")
-
-    deleted_count = crud.delete_estimation_lines(db, payload.line_ids)
-    return {"message": f"{deleted_count} lines deleted successfully."}
+    # Verify ownership of all lines with one aggregate query
+    if not is_admin_user(current_user):
+        foreign_lines = db.execute(
+            select(func.count())
+            .select_from(models.EstimationLine)
+            .join(models.Estimation, models.Estimation.estimation_id == models.EstimationLine.estimation_id)
+            .where(
+                models.EstimationLine.line_id.in_(payload.line_ids),
+                models.Estimation.created_by_id.is_distinct_from(current_user.user_id),
+            )
+        ).scalar()
+        if foreign_lines:
+            raise HTTPException(status_code=403, detail="Not authorized to modify this estimation")
+
+    deleted_estimation_ids = crud.delete_estimation_lines(db, payload.line_ids)
+    for est_id in set(deleted_estimation_ids):
+        invalidate_total(est_id)
+    return {"message": f"{len(deleted_estimation_ids)} lines deleted successfully."}
 
 @router.put("/lines/{line_id}", response_model=schemas.EstimationLine)
 def update_line(
     line_id: int, 
     payload: schemas.EstimationLineCreate, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE)
 ):
-    line = db.get(models.EstimationLine, line_id)
-    if not line:
+    row = db.execute(
+        select(models.EstimationLine, models.Estimation)
+        .join(models.Estimation, models.Estimation.estimation_id == models.EstimationLine.estimation_id)
+        .where(models.EstimationLine.line_id == line_id)
+    ).one_or_none()
+    if row is None:
         raise HTTPException(status_code=404, detail="Line not found")
+    line, est = row
         
-    est = db.get(models.Estimation, line.estimation_id)
-    if est and est.created_by_id != current_user.user_id and not is_admin_user(current_user):
+    if est.created_by_id != current_user.user_id and not is_admin_user(current_user):
         raise HTTPException(status_code=403, detail="Not authorized to modify this estimation")
 
     updated_line = crud.update_estimation_line(db, line_id, payload)
     if updated_line is None:
         raise HTTPException(status_code=404, detail="Line not found")
+    invalidate_total(est.estimation_id)
     return updated_line
 
+def _json_lines_array(lines, chunk_size: int = 200):
+    """Serialize estimation lines as a JSON array, yielding chunk_size lines at a time."""
+    yield b"["
+    chunk = []
+    first = True
+    for line in lines:
+        chunk.append(schemas.EstimationLine.model_validate(line).model_dump_json().encode())
+        if len(chunk) == chunk_size:
+            yield (b"" if first else b",") + b",".join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b"" if first else b",") + b",".join(chunk)
+    yield b"]"
+
 @router.get("/{estimation_id}/lines", response_model=List[schemas.EstimationLine])
 def list_lines(
     estimation_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:read"))
+    current_user: models.User = Depends(EST_READ)
 ):
-    return crud.list_estimation_lines(db, estimation_id)
-
-
+    # Rows are fetched and serialized incrementally; the session stays open
+    # until the response has been sent.
+    return StreamingResponse(
+        _json_lines_array(crud.iter_estimation_lines(db, estimation_id)),
+        media_type="application/json",
+    )
 
 @router.delete("/{estimation_id}", response_model=schemas.Estimation)
 def delete_estimation(
     estimation_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:delete"))
+    est: models.Estimation = Depends(OWNED_FOR_DELETE)
 ):
-    est = db.get(models.Estimation, estimation_id)
-    if not est:
-        raise HTTPException(status_code=404, detail="Estimation not found")
-        
-    if est.created_by_id != current_user.user_id and not is_admin_user(current_user):
-        raise HTTPException(status_code=403, detail="Not authorized to delete this estimation")
-
     estimation = crud.delete_estimation(db, estimation_id)
+    invalidate_total(estimation_id)
     return estimation
 
 @router.get("/{estimation_id}", response_model=schemas.Estimation)
 def get_estimation(
     estimation_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:read"))
+    current_user: models.User = Depends(EST_READ)
 ):
     estimation = db.get(models.Estimation, estimation_id)
     if not estimation:
         raise HTTPException(status_code=404, detail="Estimation not found")
     return estimation
 
-@router.get("/{estimation_id}/total")
+@router.get("/{estimation_id}/total", response_model=schemas.EstimationTotal)
 def get_total(
     estimation_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:read"))
-) -> Dict[str, Any]:
-    total = crud.estimation_total(db, estimation_id)
+    current_user: models.User = Depends(EST_READ)
+):
+    with _totals_lock:
+        total = _totals_cache.get(estimation_id)
+        generation = _totals_generation
+    if total is None:
+        total = crud.estimation_total(db, estimation_id)
+        with _totals_lock:
+            if _totals_generation == generation:
+                _totals_cache[estimation_id] = total
     return {"estimation_id": estimation_id, "grand_total": total}
 
 @router.patch("/{estimation_id}", response_model=schemas.Estimation)
@@ -232,15 +286,9 @@ def update_estimation(
     estimation_id: int,
     payload: schemas.EstimationUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE),
+    est: models.Estimation = Depends(OWNED_FOR_PATCH)
 ):
-    est = db.get(models.Estimation, estimation_id)
-    if not est:
-        raise HTTPException(status_code=404, detail="Estimation not found")
-        
-    if est.created_by_id != current_user.user_id and not is_admin_user(current_user):
-        raise HTTPException(status_code=403, detail="Not authorized to update this estimation")
-
     updated = crud.update_estimation(db, estimation_id, payload, current_user.user_id)
     return updated
 
@@ -249,7 +297,7 @@ def update_special_item_request_endpoint(
     request_id: int,
     payload: schemas.SpecialItemRequestCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE)
 ):
     # Verify ownership
     req = db.get(models.SpecialItemRequest, request_id)
@@ -264,11 +312,11 @@ def update_special_item_request_endpoint(
         raise HTTPException(status_code=400, detail="Cannot update request (must be pending)")
     return updated
 
-@router.delete("/special-item-requests/{request_id}")
+@router.delete("/special-item-requests/{request_id}", response_model=schemas.Message)
 def delete_special_item_request_endpoint(
     request_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(check_permission("estimations:update"))
+    current_user: models.User = Depends(EST_UPDATE)
 ):
     # Verify ownership
     req = db.get(models.SpecialItemRequest, request_id)
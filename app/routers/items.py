@@ -1,37 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import SessionLocal
+from sqlalchemy.exc import IntegrityError
+from typing import List, Literal
 from .. import schemas, crud, models
+from ..deps import get_db, is_admin_user, etag_headers
 from ..security import get_current_user, check_permission
+from ..config import settings
 from ..services.parsers import (
-    parse_item_master_csv_text,
-    parse_item_master_xlsx_bytes,
-    parse_item_master_pivot_csv_text,
-    parse_item_master_pivot_xlsx_bytes,
+    parse_item_master_csv_stream,
+    parse_item_master_xlsx_upload,
 )
-import io
+import os
 import csv
-from fastapi.responses import StreamingResponse, Response
+import anyio.to_thread
+import asyncio
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from cachetools import TTLCache
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+try:
+    # Optional dependency for writing .xlsx
+    import xlsxwriter
+except Exception:
+    xlsxwriter = None
 try:
-    from ..security import get_current_user, check_permission, is_admin_user
-except ImportError:
-    # Mock the security functions if not available
-    def get_current_user():
-        return None
-    def check_permission(perm: str):
-        return True
-    def is_admin_user(user: models.User):
-        return False
+    # Fallback .xlsx writer (also used by the import parsers)
+    from openpyxl import Workbook
+except Exception:
+    Workbook = None
 
-router = APIRouter(prefix="/items", tags=["Items & Divisions"])
+logger = logging.getLogger(__name__)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+router = APIRouter(prefix="/items", tags=["Items & Divisions"])
 
 @router.post("/divisions", response_model=schemas.Division)
 def create_division(
@@ -44,19 +50,21 @@ def create_division(
     # Handle duplicate division names gracefully
     try:
         return crud.create_division(db, payload)
-    except Exception as e:
-        from sqlalchemy.exc import IntegrityError
-        if isinstance(e, IntegrityError):
-            db.rollback()
-            raise HTTPException(status_code=409, detail="Division already exists")
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Division already exists")
+    except Exception:
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.get("/divisions", response_model=List[schemas.Division])
 def list_divisions(
+    after_id: int | None = Query(None, ge=0),
+    limit: int | None = Query(None, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_permission("items:read"))
 ):
-    return crud.list_divisions(db)
+    """List divisions ordered by id. Pass limit (and the last division_id seen as after_id) to page."""
+    return crud.list_divisions(db, after_id=after_id, limit=limit)
 
 @router.delete("/divisions/{division_id}", response_model=schemas.Division)
 def delete_division(
@@ -66,7 +74,15 @@ def delete_division(
 ):
     if not is_admin_user(current_user):
         raise HTTPException(status_code=403, detail="Admin access required")
-    division = crud.delete_division(db, division_id)
+    # Items cascade with the division; let the FK on estimation lines reject it rather than pre-counting
+    try:
+        division = crud.delete_division(db, division_id)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Division has items referenced by estimation lines; remove references before deletion.",
+        )
     if not division:
         raise HTTPException(status_code=404, detail="Division not found")
     return division
@@ -94,8 +110,8 @@ def read_items(
     unit: str | None = None,
     rate_min: float | None = None,
     rate_max: float | None = None,
-    sort_by: str = Query("item_code", pattern="^(item_code|division|rate|region)$"),
-    order: str = Query("asc", pattern="^(asc|desc)$"),
+    sort_by: Literal["item_code", "division", "rate", "region"] = Query("item_code"),
+    order: Literal["asc", "desc"] = Query("asc"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_permission("items:read"))
 ):
@@ -134,7 +150,7 @@ def read_items(
             order=order
         )
     except Exception as e:
-        print(f"Error in read_items: {e}")
+        logger.exception("Error in read_items")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.get("/count")
@@ -171,7 +187,7 @@ def count_items(
         )
         return {"count": total}
     except Exception as e:
-        print(f"Error in count_items: {e}")
+        logger.exception("Error in count_items")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.get("/special", response_model=List[schemas.SpecialItem])
@@ -187,8 +203,8 @@ def read_special_items(
     unit: str | None = None,
     rate_min: float | None = None,
     rate_max: float | None = None,
-    sort_by: str = Query("item_code", pattern="^(item_code|division|rate|region)$"),
-    order: str = Query("asc", pattern="^(asc|desc)$"),
+    sort_by: Literal["item_code", "division", "rate", "region"] = Query("item_code"),
+    order: Literal["asc", "desc"] = Query("asc"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_permission("items:read"))
 ):
@@ -211,7 +227,7 @@ def read_special_items(
             order=order
         )
     except Exception as e:
-        print(f"Error in read_special_items: {e}")
+        logger.exception("Error in read_special_items")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @router.put("/{item_id}", response_model=schemas.Item)
@@ -226,9 +242,7 @@ def update_item(
         raise HTTPException(status_code=404, detail="Item not found")
     return item
 
-from sqlalchemy.exc import IntegrityError
-
-@router.delete("/{item_id}", response_model=schemas.Item)
+@router.delete("/{item_id}", response_model=schemas.ItemDeleted)
 def delete_item(
     item_id: int, 
     db: Session = Depends(get_db),
@@ -244,8 +258,9 @@ def delete_item(
         if obj.special_item:
             db.delete(obj.special_item)
 
-        # Prepare response before the object is deleted/expired
-        response_payload = schemas.Item.model_validate(obj)
+        # Prepare response before the object is deleted/expired; columns only, so the
+        # division relationship is not loaded just for the response body
+        response_payload = schemas.ItemDeleted.model_validate(obj)
         db.delete(obj)
         db.commit()
         return response_payload
@@ -257,8 +272,58 @@ def delete_item(
         )
 
 # ===== Export Items =====
+# Region columns of the pivoted Item Master, in export order
+REGION_HEADERS = (
+    "Dhaka Zone",
+    "Mymensingh Zone",
+    "Comilla Zone",
+    "Sylhet Zone",
+    "Khulna Zone",
+    "Barisal Zone",
+    "Gopalganj Zone",
+    "Rajshahi Zone",
+    "Rangpur Zone",
+    "Chattogram Zone",
+)
+EXPORT_HEADERS = ("Item Code", "Major Division", "Description", "Unit", *REGION_HEADERS, "Organization")
+# Stored region spellings that map onto a different export header
+_REGION_ALIAS = {"Cumilla Zone": "Comilla Zone"}
+
+# Exports carry an ETag derived from the item master fingerprint; clients must revalidate
+EXPORT_CACHE_CONTROL = "private, no-cache"
+# Rendered exports keyed by format and fingerprint (only complete, reasonably sized
+# bodies: characters for CSV, bytes for XLSX)
+_export_cache: TTLCache = TTLCache(maxsize=2, ttl=300)
+_export_lock = threading.Lock()
+EXPORT_CACHE_MAX_SIZE = 20_000_000
+
+# Export rendering runs on its own few worker threads so long exports cannot take
+# over the shared threadpool that serves every other sync route
+_export_limiter: anyio.CapacityLimiter | None = None
+# CSV rows formatted per worker-thread hop
+EXPORT_BATCH_ROWS = 500
+
+async def _run_export(func, *args):
+    """Run blocking export work (DB reads, formatting) on the export worker threads."""
+    global _export_limiter
+    if _export_limiter is None:
+        _export_limiter = anyio.CapacityLimiter(settings.EXPORT_THREADS)
+    return await anyio.to_thread.run_sync(func, *args, limiter=_export_limiter)
+
+def _iter_export_rows(db: Session, blank):
+    """Export rows in header order; rates as floats, missing rates as `blank`."""
+    # One row per (division, item code, organization); region name normalized to the header spelling
+    for row in crud.list_items_pivoted(db, REGION_HEADERS, _REGION_ALIAS):
+        yield [*row[:4], *(float(val) if val is not None else blank for val in row[4:-1]), row[-1]]
+
+class _Echo:
+    """File-like sink for csv.writer: writerow() returns the formatted line."""
+    def write(self, value):
+        return value
+
 @router.get("/export.csv")
-def export_items_csv(
+async def export_items_csv(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_permission("items:read"))
 ):
@@ -269,204 +334,183 @@ def export_items_csv(
     Dhaka Zone, Mymensingh Zone, Comilla Zone, Sylhet Zone, Khulna Zone,
     Barisal Zone, Gopalganj Zone, Rajshahi Zone, Rangpur Zone, Chattogram Zone, Organization
     """
-    items = crud.list_items(db)
-
-    # Map items by (division_id, item_code, organization) to pivot region rates
-    grouped: dict[tuple, dict] = {}
-    for it in items:
-        key = (it.division_id, it.item_code, (getattr(it, "organization", None) or "RHD"))
-        if key not in grouped:
-            grouped[key] = {
-                "item_code": it.item_code,
-                "division_name": it.division.name if it.division else "",
-                "description": it.item_description or "",
-                "unit": it.unit or "",
-                "organization": (getattr(it, "organization", None) or "RHD"),
-                "rates": {},
-            }
-        # Normalize region name to match requested header spelling
-        region = it.region or ""
-        if region == "Cumilla Zone":
-            region = "Comilla Zone"
-        grouped[key]["rates"][region] = float(it.rate) if it.rate is not None else None
-
-    region_headers = [
-        "Dhaka Zone",
-        "Mymensingh Zone",
-        "Comilla Zone",
-        "Sylhet Zone",
-        "Khulna Zone",
-        "Barisal Zone",
-        "Gopalganj Zone",
-        "Rajshahi Zone",
-        "Rangpur Zone",
-        "Chattogram Zone",
-    ]
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    headers = [
-        "Item Code",
-        "Major Division",
-        "Description",
-        "Unit",
-        *region_headers,
-        "Organization",
-    ]
-    writer.writerow(headers)
-
-    # Sort rows by division then item code for stable output
-    sorted_rows = sorted(grouped.values(), key=lambda r: (r["division_name"], r["item_code"]))
-    for row in sorted_rows:
-        line = [
-            row["item_code"],
-            row["division_name"],
-            row["description"],
-            row["unit"],
-        ]
-        for rh in region_headers:
-            val = row["rates"].get(rh)
-            line.append(val if val is not None else "")
-        line.append(row["organization"])
-        writer.writerow(line)
-
-    output.seek(0)
-    return StreamingResponse(output, media_type="text/csv", headers={
-        "Content-Disposition": "attachment; filename=ItemMaster.csv"
-    })
+    version = f"csv-{await _run_export(crud.get_items_fingerprint, db)}"
+    headers, not_modified = etag_headers(request, version, EXPORT_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+    headers["Content-Disposition"] = "attachment; filename=ItemMaster.csv"
+
+    with _export_lock:
+        cached = _export_cache.get(version)
+    if cached is not None:
+        return Response(content=cached, media_type="text/csv", headers=headers)
+
+    rows = _iter_export_rows(db, "")
+
+    writer = csv.writer(_Echo())
+
+    def next_batch() -> str:
+        # Fetching from the DB cursor blocks, so each batch is formatted on an
+        # export thread; "" once the rows are exhausted
+        return "".join(
+            writer.writerow(row) for _, row in zip(range(EXPORT_BATCH_ROWS), rows)
+        )
+
+    async def iter_and_cache():
+        # Cache the body only once it has been streamed out completely
+        chunk = writer.writerow(EXPORT_HEADERS)
+        chunks, size = [], 0
+        while chunk:
+            yield chunk
+            if chunks is not None:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > EXPORT_CACHE_MAX_SIZE:
+                    chunks = None
+            chunk = await _run_export(next_batch)
+        if chunks is not None:
+            with _export_lock:
+                _export_cache[version] = "".join(chunks)
+
+    return StreamingResponse(iter_and_cache(), media_type="text/csv", headers=headers)
+
+def _write_items_xlsx(db: Session, path: str) -> None:
+    lines = _iter_export_rows(db, None)
+    if xlsxwriter is not None:
+        # constant_memory flushes each row to disk as soon as the next one starts,
+        # so rows must arrive in order (the pivot query already sorts them)
+        wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+        ws = wb.add_worksheet("Item Master")
+        ws.write_row(0, 0, EXPORT_HEADERS)
+        for row_idx, line in enumerate(lines, start=1):
+            ws.write_row(row_idx, 0, line)
+        wb.close()
+    else:
+        # openpyxl write-only mode also streams rows instead of keeping cells in memory
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Item Master")
+        ws.append(EXPORT_HEADERS)
+        for line in lines:
+            ws.append(line)
+        wb.save(path)
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
 
 @router.get("/export.xlsx")
-def export_items_xlsx(
+async def export_items_xlsx(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_permission("items:read"))
 ):
-    if Workbook is None:
-        # Gracefully indicate XLSX export is not available without openpyxl
-        raise HTTPException(status_code=501, detail="XLSX export not available: openpyxl is not installed")
-
-    items = crud.list_items(db)
-    # Pivot grouping
-    grouped: dict[tuple, dict] = {}
-    for it in items:
-        key = (it.division_id, it.item_code, (getattr(it, "organization", None) or "RHD"))
-        if key not in grouped:
-            grouped[key] = {
-                "item_code": it.item_code,
-                "division_name": it.division.name if it.division else "",
-                "description": it.item_description or "",
-                "unit": it.unit or "",
-                "organization": (getattr(it, "organization", None) or "RHD"),
-                "rates": {},
-            }
-        region = it.region or ""
-        if region == "Cumilla Zone":
-            region = "Comilla Zone"
-        grouped[key]["rates"][region] = float(it.rate) if it.rate is not None else None
-
-    region_headers = [
-        "Dhaka Zone",
-        "Mymensingh Zone",
-        "Comilla Zone",
-        "Sylhet Zone",
-        "Khulna Zone",
-        "Barisal Zone",
-        "Gopalganj Zone",
-        "Rajshahi Zone",
-        "Rangpur Zone",
-        "Chattogram Zone",
-    ]
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Item Master"
-    headers = [
-        "Item Code",
-        "Major Division",
-        "Description",
-        "Unit",
-        *region_headers,
-        "Organization",
-    ]
-    ws.append(headers)
-
-    sorted_rows = sorted(grouped.values(), key=lambda r: (r["division_name"], r["item_code"]))
-    for row in sorted_rows:
-        line = [
-            row["item_code"],
-            row["division_name"],
-            row["description"],
-            row["unit"],
-        ]
-        for rh in region_headers:
-            val = row["rates"].get(rh)
-            line.append(val if val is not None else None)
-        line.append(row["organization"])
-        ws.append(line)
-
-    bio = io.BytesIO()
-    wb.save(bio)
-    bio.seek(0)
-    return Response(content=bio.read(), media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={
-        "Content-Disposition": "attachment; filename=ItemMaster.xlsx"
-    })
+    if xlsxwriter is None and Workbook is None:
+        # Gracefully indicate XLSX export is not available without an xlsx writer
+        raise HTTPException(status_code=501, detail="XLSX export not available: install xlsxwriter or openpyxl")
+
+    version = f"xlsx-{await _run_export(crud.get_items_fingerprint, db)}"
+    headers, not_modified = etag_headers(request, version, EXPORT_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    with _export_lock:
+        cached = _export_cache.get(version)
+    if cached is not None:
+        headers["Content-Disposition"] = 'attachment; filename="ItemMaster.xlsx"'
+        return Response(content=cached, media_type=media_type, headers=headers)
+
+    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+    tmp.close()
+    try:
+        await _run_export(_write_items_xlsx, db, tmp.name)
+        if os.path.getsize(tmp.name) <= EXPORT_CACHE_MAX_SIZE:
+            # Keep the rendered workbook so repeat downloads skip the DB and the writer
+            content = await _run_export(_read_file, tmp.name)
+            with _export_lock:
+                _export_cache[version] = content
+    except BaseException:
+        # FileResponse's background unlink never runs if we fail before returning
+        os.unlink(tmp.name)
+        raise
+
+    return FileResponse(
+        tmp.name,
+        media_type=media_type,
+        filename="ItemMaster.xlsx",
+        headers=headers,
+        background=BackgroundTask(os.unlink, tmp.name),
+    )
 
 # ===== Import Items =====
+_parse_pool: ProcessPoolExecutor | None = None
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Worker processes for CPU-bound XLSX parsing, created on first import."""
+    global _parse_pool
+    if _parse_pool is None:
+        # spawn, not fork: the server process already runs threads
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=settings.IMPORT_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_pool
+
+def _discard_parse_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next import starts fresh worker processes."""
+    global _parse_pool
+    if _parse_pool is pool:
+        _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
 @router.post("/import")
-def import_items(
+async def import_items(
     file: UploadFile = File(...),
-    mode: str = Query("append", pattern="^(append|replace)$"),
+    mode: Literal["append", "replace"] = Query("append"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(check_permission("items:create"))
 ):
-    # Read uploaded file bytes
-    file_bytes = file.file.read()
     filename = file.filename or "uploaded"
     ext = filename.split(".")[-1].lower() if "." in filename else ""
     
-    print(f"DEBUG: Import called with file={filename}, mode={mode}, size={len(file_bytes)} bytes")
+    logger.debug("Import called with file=%s, mode=%s, size=%s bytes", filename, mode, file.size)
 
-    # Parse according to provided format
+    # Parse according to provided format. Nothing blocking runs on the event loop:
+    # CSV is parsed lazily off the spooled file on a worker thread, XLSX in a worker process.
     try:
-        if ext == "csv":
-            text = file_bytes.decode("utf-8", errors="replace")
-            print(f"DEBUG: CSV content first 200 chars: {text[:200]}")
-            # Try linear format first, then pivoted as fallback
+        if ext == "csv" or (ext not in ("xlsx", "xlsm") and file.content_type and "csv" in file.content_type):
+            # Linear format first, then pivoted as fallback
+            parsed = await run_in_threadpool(parse_item_master_csv_stream, file.file)
+        elif ext in ("xlsx", "xlsm") or (file.content_type and "spreadsheet" in file.content_type):
+            file_bytes = await file.read()
+            loop = asyncio.get_running_loop()
+            pool = get_parse_pool()
             try:
-                parsed = parse_item_master_csv_text(text)
-                print(f"DEBUG: Parsed {len(parsed)} rows from CSV (linear format)")
-            except Exception as e1:
-                print(f"DEBUG: Linear format failed: {e1}, trying pivoted...")
-                parsed = parse_item_master_pivot_csv_text(text)
-                print(f"DEBUG: Parsed {len(parsed)} rows from CSV (pivoted format)")
-        elif ext in ("xlsx", "xlsm"):
-            # Try linear format first, then pivoted as fallback
-            try:
-                parsed = parse_item_master_xlsx_bytes(file_bytes)
-                print(f"DEBUG: Parsed {len(parsed)} rows from XLSX (linear format)")
-            except Exception as e1:
-                print(f"DEBUG: Linear format failed: {e1}, trying pivoted...")
-                parsed = parse_item_master_pivot_xlsx_bytes(file_bytes)
-                print(f"DEBUG: Parsed {len(parsed)} rows from XLSX (pivoted format)")
+                parsed = await loop.run_in_executor(pool, parse_item_master_xlsx_upload, file_bytes)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); the file is not at fault
+                logger.error("XLSX parse worker died; recreating the parse pool")
+                _discard_parse_pool(pool)
+                raise HTTPException(status_code=503, detail="File parser unavailable, please retry the import")
         else:
-            # Try content-type as fallback
-            if file.content_type and "csv" in file.content_type:
-                text = file_bytes.decode("utf-8", errors="replace")
-                try:
-                    parsed = parse_item_master_csv_text(text)
-                    print(f"DEBUG: Parsed {len(parsed)} rows from {file.content_type}")
-                except Exception:
-                    parsed = parse_item_master_pivot_csv_text(text)
-            elif file.content_type and "spreadsheet" in file.content_type:
-                try:
-                    parsed = parse_item_master_xlsx_bytes(file_bytes)
-                except Exception:
-                    parsed = parse_item_master_pivot_xlsx_bytes(file_bytes)
-            else:
-                raise HTTPException(status_code=400, detail="Unsupported file type. Upload CSV or XLSX in Item Master format.")
+            raise HTTPException(status_code=400, detail="Unsupported file type. Upload CSV or XLSX in Item Master format.")
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"DEBUG: Parse error: {e}")
+        logger.info("Import parse error: %s", e)
         raise HTTPException(status_code=400, detail=f"Failed to parse file: {e}")
 
+    # Validation and the DB writes use the sync session, so they run on a worker thread
+    return await run_in_threadpool(_import_parsed_items, db, parsed, mode)
+
+def _import_parsed_items(db: Session, parsed, mode: str) -> dict:
+    """Validate parsed rows and write them with the bulk importer."""
     # Mode: replace or append
     # if mode == "replace":
     #    # WARNING: This clears item master; may affect existing estimations
@@ -475,21 +519,28 @@ def import_items(
     # Prepare data for bulk import
     items_to_import = []
     errors = []
+    total_rows = 0
     
-    for idx, row in enumerate(parsed, 1):
-        try:
-            # Coerce missing/blank rate to 0.0 instead of skipping
-            r = row.get("rate")
-            if r is None or (isinstance(r, str) and not r.strip()):
-                row["rate"] = 0.0
+    try:
+        for idx, row in enumerate(parsed, 1):
+            total_rows = idx
+            try:
+                # Coerce missing/blank rate to 0.0 instead of skipping
+                r = row.get("rate")
+                if r is None or (isinstance(r, str) and not r.strip()):
+                    row["rate"] = 0.0
             
-            # Validate and parse the row
-            items_to_import.append(schemas.ItemParsed(**row))
+                # Validate and parse the row
+                items_to_import.append(schemas.ItemParsedAdapter.validate_python(row))
             
-        except ValueError as ve:
-            errors.append(f"Row {idx}: {str(ve)}")
-        except Exception as e:
-            errors.append(f"Row {idx}: {str(e)}")
+            except ValueError as ve:
+                errors.append(f"Row {idx}: {str(ve)}")
+            except Exception as e:
+                errors.append(f"Row {idx}: {str(e)}")
+    except csv.Error as e:
+        # CSV rows are parsed lazily, so malformed content surfaces here
+        logger.info("Import parse error: %s", e)
+        raise HTTPException(status_code=400, detail=f"Failed to parse file: {e}")
     
     # Execute optimized bulk import
     try:
@@ -498,7 +549,7 @@ def import_items(
         errors.extend(result["errors"])
     except Exception as e:
         db.rollback()
-        print(f"DEBUG: Bulk import failed: {e}")
+        logger.exception("Bulk import failed")
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to save imported items: {str(e)}"
@@ -507,7 +558,7 @@ def import_items(
     return {
         "message": f"Import {mode} completed", 
         "processed": count, 
-        "skipped": len(parsed) - count,
+        "skipped": total_rows - count,
         "errors": errors[:50] if errors else None,
         "total_errors": len(errors) if errors else 0
     }
@@ -1,18 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from ..database import SessionLocal
+from ..deps import get_db
 from .. import schemas, crud, models
 from ..security import get_current_user, check_permission
 
 router = APIRouter(prefix="/orgs", tags=["Organizations & Regions"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # ---- Organizations ----
 @router.get("", response_model=list[schemas.Organization])
 def list_organizations(
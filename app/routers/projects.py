@@ -1,19 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from ..database import SessionLocal
+from ..deps import get_db
 from .. import schemas, crud, models
 from ..security import get_current_user, check_permission, is_admin_user
 
 router = APIRouter(prefix="/projects", tags=["Projects & Estimations"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("", response_model=schemas.Project)
 def create_project(
     payload: schemas.ProjectCreate,
@@ -35,8 +28,7 @@ def delete_project(
     if project.created_by_id != current_user.user_id and not is_admin_user(current_user):
         raise HTTPException(status_code=403, detail="Not authorized to delete this project")
 
-    project = crud.delete_project(db, project_id)
-    return project
+    return crud.delete_project_obj(db, project)
 
 @router.get("", response_model=List[schemas.Project])
 def list_projects(
@@ -63,8 +55,7 @@ def update_project(
     if project.created_by_id != current_user.user_id and not is_admin_user(current_user):
         raise HTTPException(status_code=403, detail="Not authorized to update this project")
 
-    updated = crud.update_project(db, project_id, payload, current_user.user_id)
-    return updated
+    return crud.update_project_obj(db, project, payload, current_user.user_id)
 
 @router.post("/{project_id}/estimations", response_model=schemas.Estimation)
 def create_estimation(
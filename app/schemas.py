@@ -1,4 +1,5 @@
-from pydantic import BaseModel, ConfigDict, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, PositiveInt, TypeAdapter
+from pydantic.dataclasses import dataclass as pydantic_dataclass
 from typing import List, Optional
 from datetime import datetime
 
@@ -29,6 +30,12 @@ class RoleUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
 
+class RolePermissionsAssign(BaseModel):
+    permission_ids: List[int]
+
+class UserRolesAssign(BaseModel):
+    role_ids: List[int]
+
 class Role(RoleBase):
     role_id: int
     is_system_role: bool
@@ -38,12 +45,15 @@ class Role(RoleBase):
     model_config = ConfigDict(from_attributes=True)
 
 # User Schemas
+# Emails are checked with email-validator on input only; responses carry the stored
+# value as a plain str instead of re-validating it for every user serialized.
 class UserBase(BaseModel):
     username: str
-    email: EmailStr
+    email: str
     full_name: Optional[str] = None
 
 class UserCreate(UserBase):
+    email: EmailStr
     password: str
 
 class UserUpdate(BaseModel):
@@ -176,15 +186,21 @@ class ItemUpdate(BaseModel):
     division_id: Optional[int] = None
     organization: Optional[str] = None
 
-class ItemParsed(BaseModel):
+# One row of an uploaded item master. A slotted dataclass rather than a BaseModel:
+# imports hold every row in memory at once, and a model instance (with its
+# __dict__ and fields-set) is ~10x larger. Validate dicts with ItemParsedAdapter.
+@pydantic_dataclass(slots=True)
+class ItemParsed:
     division: str
     item_code: str
     item_description: str
+    region: str
     unit: Optional[str] = None
     rate: Optional[float] = None
-    region: str
     organization: Optional[str] = "RHD"
 
+ItemParsedAdapter = TypeAdapter(ItemParsed)
+
 class Item(ItemBase):
     item_id: int
     division_id: int
@@ -193,6 +209,13 @@ class Item(ItemBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+# Response for item deletion: column values only, no nested division/special item
+class ItemDeleted(ItemBase):
+    item_id: int
+    division_id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
 # Project Schemas
 class ProjectBase(BaseModel):
     project_name: str
@@ -233,26 +256,6 @@ class EstimationLineBase(BaseModel):
     attachment_name: Optional[str] = None
     attachment_base64: Optional[str] = None
 
-class SpecialItemRequestCreate(BaseModel):
-    division_id: int
-    item_description: str
-    unit: Optional[str] = None
-    rate: Optional[float] = None
-    region: str
-    organization: str = "RHD"
-    attachment_name: Optional[str] = None
-    attachment_base64: Optional[str] = None
-    sub_description: Optional[str] = None
-    no_of_units: int = 1
-    no_of_units_expr: Optional[str] = None
-    length: Optional[float] = None
-    width: Optional[float] = None
-    thickness: Optional[float] = None
-    length_expr: Optional[str] = None
-    width_expr: Optional[str] = None
-    thickness_expr: Optional[str] = None
-    quantity: Optional[float] = None
-
 class SpecialItemRequestReject(BaseModel):
     reason: Optional[str] = None
 
@@ -293,7 +296,7 @@ class SpecialItemRequest(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 class EstimationLineCreate(BaseModel):
-    item_id: int
+    item_id: PositiveInt
     sub_description: str | None = None
     no_of_units: float | None = 1
     no_of_units_expr: str | None = None
@@ -367,4 +370,11 @@ class EstimationUpdate(BaseModel):
     estimation_name: Optional[str] = None
 
 class EstimationLineDelete(BaseModel):
-    line_ids: List[int]
+    line_ids: List[PositiveInt] = Field(min_length=1)
+
+class EstimationTotal(BaseModel):
+    estimation_id: int
+    grand_total: float
+
+class Message(BaseModel):
+    message: str
@@ -1,21 +1,34 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
-from jose import JWTError, jwt
+import jwt
+from jwt import InvalidTokenError as JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
-from .database import SessionLocal
-from .models import User
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from .deps import get_db, is_admin_user, user_role_names
+from .models import User, Role
 import os
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-environment")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-# Password hashing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# HMAC key bytes, encoded once instead of on every sign/verify
+SECRET_BYTES = SECRET_KEY.encode("utf-8")
+
+# Password hashing: Argon2id at the OWASP-recommended cost (19 MiB, 2 passes, 1 lane)
+# instead of the passlib defaults (64 MiB, 3 passes, 4 lanes). Existing hashes carry
+# their own parameters and still verify.
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__memory_cost=19456,
+    argon2__time_cost=2,
+    argon2__parallelism=1,
+)
 security = HTTPBearer()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -34,19 +47,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, SECRET_BYTES, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_db():
-    """Get database session dependency."""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+import hashlib
 import logging
 import os
+import threading
+import time
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -55,9 +64,57 @@ load_dotenv()
 # Setup logging
 logger = logging.getLogger(__name__)
 
-async def get_current_user(credentials = Depends(security), db: Session = Depends(get_db)) -> User:
+# Recently authenticated users keyed by a digest of their token, so repeat requests skip
+# the JWT verify and the roles/permissions load. Each hit still reads the user's
+# is_active and updated_at, which deactivation and every role or permission change
+# bump (crud._touch_users), so other workers drop stale entries on their next hit.
+# Changes also clear this worker's cache directly (invalidate_cached_users).
+# Entries are detached from every session and never handed out directly: each request
+# merges its own copy, so a rollback or close in one request cannot expire or detach
+# the user another request is holding.
+_user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+_user_cache_lock = threading.Lock()
+
+def invalidate_cached_users() -> None:
+    """Forget every cached authenticated user."""
+    with _user_cache_lock:
+        _user_cache.clear()
+
+def _detach_user(db: Session, user: User) -> User:
+    """Expunge a fully loaded user with its roles and permissions from the session."""
+    roles = user.roles
+    permissions = {permission for role in roles for permission in role.permissions}
+    for obj in (user, *roles, *permissions):
+        db.expunge(obj)
+    return user
+
+def _attach_user(db: Session, cached: User) -> User:
+    """Copy a cached user into this request's session without querying the database."""
+    user = db.merge(cached, load=False)
+    user._role_names = cached._role_names
+    user._permission_names = cached._permission_names
+    return user
+
+def get_current_user(credentials = Depends(security), db: Session = Depends(get_db)) -> User:
     """Get the current authenticated user from JWT token."""
+    # Plain def: the user query is blocking, so FastAPI runs this in the threadpool
+    # instead of on the event loop.
     token = credentials.credentials
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    with _user_cache_lock:
+        cached = _user_cache.get(cache_key)
+    # Entries are only reused while the token itself is still unexpired
+    if cached is not None and cached[1] > time.time():
+        cached_user = cached[0]
+        current = db.execute(
+            select(User.is_active, User.updated_at).where(User.user_id == cached_user.user_id)
+        ).first()
+        if current is not None and current.is_active and current.updated_at == cached_user.updated_at:
+            return _attach_user(db, cached_user)
+        # Changed since it was cached: reload it below (which also rejects inactive users)
+        with _user_cache_lock:
+            _user_cache.pop(cache_key, None)
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -65,7 +122,7 @@ async def get_current_user(credentials = Depends(security), db: Session = Depend
     )
     
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_BYTES, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         user_id: int = payload.get("user_id")
         if username is None or user_id is None:
@@ -75,48 +132,56 @@ async def get_current_user(credentials = Depends(security), db: Session = Depend
         logger.warning(f"JWT decode error: {str(e)}")
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    # Roles and their permissions come with the user so role/permission
+    # checks later in the request never hit the database again.
+    user = db.execute(
+        select(User)
+        .options(selectinload(User.roles).selectinload(Role.permissions))
+        .where(User.username == username)
+    ).scalar_one_or_none()
     if user is None:
         logger.warning(f"User not found for username: {username}")
         raise credentials_exception
     if not user.is_active:
         logger.warning(f"User inactive: {username}")
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is inactive")
-    
-    return user
 
-def is_superadmin(user: User = Depends(get_current_user)) -> User:
-    """Dependency to check if user is a superadmin."""
-    for role in user.roles:
-        if role.name == "superadmin":
-            return user
-    raise HTTPException(
-        status_code=status.HTTP_403_FORBIDDEN,
-        detail="Superadmin access required"
-    )
+    # Build the memoized role/permission sets now so every merged copy reuses them
+    user_role_names(user)
+    user_permission_names(user)
+    cached_user = _detach_user(db, user)
+    with _user_cache_lock:
+        _user_cache[cache_key] = (cached_user, payload.get("exp", 0))
+    
+    return _attach_user(db, cached_user)
 
 def is_admin(user: User = Depends(get_current_user)) -> User:
     """Dependency to check if user is an admin or superadmin."""
-    for role in user.roles:
-        if role.name in ("admin", "superadmin"):
-            return user
+    if is_admin_user(user):
+        return user
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
         detail="Admin access required"
     )
 
-def is_admin_user(user: User) -> bool:
-    """Check if user has admin or superadmin role."""
-    return any(r.name in ("admin", "superadmin") for r in (user.roles or []))
+def user_permission_names(user: User) -> frozenset[str]:
+    """Names of every permission granted through the user's roles (memoized for the request)."""
+    names = getattr(user, "_permission_names", None)
+    if names is None:
+        names = user._permission_names = frozenset(
+            permission.name for role in user.roles for permission in role.permissions
+        )
+    return names
 
+# One checker per permission/role name: FastAPI caches dependencies per callable, so
+# repeated check_permission("x") calls in one request's graph run the check once.
+@lru_cache(maxsize=None)
 def check_permission(required_permission: str):
     """Dependency to check if user has a specific permission."""
     async def permission_checker(current_user: User = Depends(get_current_user)):
         # Check if user has the required permission through their roles
-        for role in current_user.roles:
-            for permission in role.permissions:
-                if permission.name == required_permission:
-                    return current_user
+        if required_permission in user_permission_names(current_user):
+            return current_user
         
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -125,12 +190,12 @@ def check_permission(required_permission: str):
     
     return permission_checker
 
+@lru_cache(maxsize=None)
 def check_role(required_role: str):
     """Dependency to check if user has a specific role."""
     async def role_checker(current_user: User = Depends(get_current_user)):
-        for role in current_user.roles:
-            if role.name == required_role:
-                return current_user
+        if required_role in user_role_names(current_user):
+            return current_user
         
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -141,9 +206,8 @@ def check_role(required_role: str):
 
 def is_superadmin(current_user: User = Depends(get_current_user)):
     """Dependency to check if user is a superadmin."""
-    for role in current_user.roles:
-        if role.name == "superadmin":
-            return current_user
+    if "superadmin" in user_role_names(current_user):
+        return current_user
     
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
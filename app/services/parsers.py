@@ -1,5 +1,10 @@
 import csv
-from typing import List, Dict, Any
+import io
+import logging
+from sys import intern
+from contextlib import closing
+from operator import itemgetter
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Sequence
 
 try:
     # Optional dependency for reading .xlsx
@@ -7,8 +12,32 @@ try:
 except Exception:
     load_workbook = None
 
+try:
+    # Optional faster .xlsx reader (compiled, returns plain values); openpyxl is the fallback
+    from python_calamine import CalamineWorkbook
+except Exception:
+    CalamineWorkbook = None
+
+logger = logging.getLogger(__name__)
+
+# Cell values read as empty: "-", "none" and "null" in any letter case. Common spellings
+# are matched directly, so lower() only runs for other casings of the 4-letter tokens
+_NULL_TOKENS = frozenset({"none", "null", "-"})
+_NULL_SPELLINGS = frozenset({"", "-", "none", "None", "NONE", "null", "Null", "NULL"})
+
+def _clean_str(value) -> str:
+    s = str(value).strip() if value is not None else ""
+    return "" if s in _NULL_SPELLINGS or (len(s) == 4 and s[0] in "nN" and s.lower() in _NULL_TOKENS) else s
+
+def _clean_unit(value) -> str | None:
+    s = str(value).strip() if value is not None else ""
+    return None if s in _NULL_SPELLINGS or (len(s) == 4 and s[0] in "nN" and s.lower() in _NULL_TOKENS) else s
+
 
 # ==== Item Master Import (User-provided export format) ====
+# Division, unit, region and organization repeat on nearly every row, so the parsers
+# intern them: all rows of an import share one object per distinct value, and the
+# XLSX worker's pickled result carries each value once instead of once per row.
 ITEM_MASTER_HEADERS = [
     "Division", "Item Code", "Description", "Unit", "Rate", "Region"
 ]
@@ -21,15 +50,28 @@ PIVOT_REGION_COLUMNS = [
 ]
 
 def parse_item_master_pivot_csv_text(text: str) -> List[Dict[str, Any]]:
-    """Parse pivoted Item Master CSV text to a list of dicts expected by ItemParsed.
+    """Parse pivoted Item Master CSV text to a list of dicts expected by ItemParsed."""
+    return list(iter_item_master_pivot_csv_rows(_csv_text_stream(text)))
+
+def _csv_text_stream(text: str) -> io.TextIOWrapper:
+    """Stream CSV text line by line the way uploads are read (UTF-8, newline="").
+
+    Cheaper than text.splitlines(), which holds every line as a separate string,
+    or StringIO, which copies the text into a 4-bytes-per-character buffer; it also
+    keeps newlines inside quoted fields and does not split rows on U+2028 and the like.
+    """
+    return io.TextIOWrapper(io.BytesIO(text.encode("utf-8")), encoding="utf-8", newline="")
+
+def iter_item_master_pivot_csv_rows(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parse pivoted Item Master CSV lines lazily into dicts expected by ItemParsed.
 
+    Headers are validated before returning, so a wrong format fails immediately.
     Flexible header parsing:
     - Accept base headers using common synonyms and case-insensitive matching.
     - Treat any non-base columns (except optional SI. No and Organization) as region columns.
     """
-    data: List[Dict[str, Any]] = []
-    reader = csv.DictReader(text.splitlines())
-    fieldnames_raw = reader.fieldnames or []
+    reader = csv.reader(lines)
+    fieldnames_raw = next(reader, None) or []
     # Normalize headers: strip and lower for matching, keep original for value access
     norm = lambda s: str(s or "").strip().lower()
     field_map = {norm(h): h for h in fieldnames_raw}
@@ -70,97 +112,197 @@ def parse_item_master_pivot_csv_text(text: str) -> List[Dict[str, Any]]:
     base_set = {item_code_h, division_h, description_h, unit_h}
     optional_set = {si_h, org_h}
     region_headers = [h for h in fieldnames_raw if h not in base_set and h not in optional_set]
+
+    # Rows are read positionally; a repeated header resolves to its last column, as with DictReader
+    col = {h: i for i, h in enumerate(fieldnames_raw)}
+    item_code_i, division_i, description_i, unit_i = (col[h] for h in (item_code_h, division_h, description_h, unit_h))
+    org_i = col[org_h] if org_h else None
     # Backward compatibility: allow 'Cumilla Zone' as 'Comilla Zone'
-    region_headers = ["Comilla Zone" if h == "Cumilla Zone" else h for h in region_headers]
-
-    def clean_str(value) -> str:
-        s = str(value).strip() if value is not None else ""
-        return "" if s.lower() in ("none", "null", "-") else s
-
-    def clean_unit(value) -> str | None:
-        s = str(value).strip() if value is not None else ""
-        return None if s == "" or s.lower() in ("none", "null", "-") else s
-
-    for row in reader:
-        division = clean_str(row.get(division_h))
-        item_code = clean_str(row.get(item_code_h))
-        description = clean_str(row.get(description_h))
-        unit = clean_unit(row.get(unit_h))
-        org_raw = row.get(org_h) if org_h else None
-        organization = clean_str(org_raw) or "RHD"
-        if not item_code and not description:
-            continue
+    regions = [(col[h], "Comilla Zone" if h == "Cumilla Zone" else h) for h in region_headers]
+    width = len(fieldnames_raw)
 
-        for region in region_headers:
-            rate_str = row.get(region)
-            rate = None
-            if rate_str not in (None, "", "-"):
-                try:
-                    rate = float(rate_str)
-                except ValueError:
-                    rate = None
-            entry: Dict[str, Any] = {
-                "division": division,
-                "item_code": item_code,
-                "item_description": description,
-                "unit": unit,
-                "rate": rate,
-                "region": region,
-                "organization": organization,
-            }
-            data.append(entry)
-    return data
+    def rows() -> Iterator[Dict[str, Any]]:
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [None] * (width - len(row))
+            division = intern(_clean_str(row[division_i]))
+            item_code = _clean_str(row[item_code_i])
+            description = _clean_str(row[description_i])
+            unit = _clean_unit(row[unit_i])
+            if unit:
+                unit = intern(unit)
+            org_raw = row[org_i] if org_i is not None else None
+            organization = intern(_clean_str(org_raw) or "RHD")
+            if not item_code and not description:
+                continue
+
+            for region_i, region in regions:
+                rate_str = row[region_i]
+                rate = None
+                if rate_str not in (None, "", "-"):
+                    try:
+                        rate = float(rate_str)
+                    except ValueError:
+                        rate = None
+                entry: Dict[str, Any] = {
+                    "division": division,
+                    "item_code": item_code,
+                    "item_description": description,
+                    "unit": unit,
+                    "rate": rate,
+                    "region": region,
+                    "organization": organization,
+                }
+                yield entry
+    return rows()
 
 def parse_item_master_csv_text(text: str) -> List[Dict[str, Any]]:
     """Parse Item Master CSV text (string) to a list of dicts expected by ItemParsed."""
-    data: List[Dict[str, Any]] = []
-    reader = csv.DictReader(text.splitlines())
+    return list(iter_item_master_csv_rows(_csv_text_stream(text)))
+
+def iter_item_master_csv_rows(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parse Item Master CSV lines lazily; headers are validated before returning."""
+    reader = csv.reader(lines)
+    fieldnames = next(reader, None) or []
     # Basic header validation
-    missing = [h for h in ITEM_MASTER_HEADERS if h not in reader.fieldnames]
+    missing = [h for h in ITEM_MASTER_HEADERS if h not in fieldnames]
     if missing:
         raise ValueError(f"Missing expected headers in Item Master CSV: {missing}")
-    def clean_str(value) -> str:
-        s = str(value).strip() if value is not None else ""
-        return "" if s.lower() in ("none", "null", "-") else s
+    # Rows are read positionally; a repeated header resolves to its last column, as with DictReader
+    col = {h: i for i, h in enumerate(fieldnames)}
+    division_i, item_code_i, description_i, unit_i, rate_i, region_i = (col[h] for h in ITEM_MASTER_HEADERS)
+    width = len(fieldnames)
+    def rows() -> Iterator[Dict[str, Any]]:
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [None] * (width - len(row))
+            rate_val = row[rate_i]
+            try:
+                rate = float(rate_val) if rate_val not in (None, "", "-") else None
+            except ValueError:
+                rate = None
+            unit = _clean_unit(row[unit_i])
+            entry = {
+                "division": intern(_clean_str(row[division_i])),
+                "item_code": _clean_str(row[item_code_i]),
+                "item_description": _clean_str(row[description_i]),
+                "unit": intern(unit) if unit else unit,
+                "rate": rate,
+                "region": intern(_clean_str(row[region_i])),
+            }
+            # Skip rows missing essential identifiers
+            if not entry["item_code"] and not entry["item_description"]:
+                continue
+            yield entry
+    return rows()
 
-    def clean_unit(value) -> str | None:
-        s = str(value).strip() if value is not None else ""
-        return None if s == "" or s.lower() in ("none", "null", "-") else s
+def parse_item_master_csv_stream(fp: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Stream an uploaded Item Master CSV, trying the linear format first and then the pivoted one.
 
-    for row in reader:
-        rate_val = row.get("Rate")
+    The file is decoded incrementally, so only the current row is held in memory.
+    """
+    for parse in (iter_item_master_csv_rows, iter_item_master_pivot_csv_rows):
+        fp.seek(0)
+        text = io.TextIOWrapper(fp, encoding="utf-8", errors="replace", newline="")
         try:
-            rate = float(rate_val) if rate_val not in (None, "", "-") else None
-        except ValueError:
-            rate = None
-        entry = {
-            "division": clean_str(row.get("Division")),
-            "item_code": clean_str(row.get("Item Code")),
-            "item_description": clean_str(row.get("Description")),
-            "unit": clean_unit(row.get("Unit")),
-            "rate": rate,
-            "region": clean_str(row.get("Region")),
-        }
-        # Skip rows missing essential identifiers
-        if not entry["item_code"] and not entry["item_description"]:
+            rows = parse(text)
+        except ValueError as e:
+            logger.debug("%s rejected headers: %s", parse.__name__, e)
+            # Detach so discarding the wrapper does not close the upload
+            text.detach()
+            if parse is iter_item_master_pivot_csv_rows:
+                raise
             continue
-        data.append(entry)
-    return data
+        return _detach_when_done(text, rows)
+
+def parse_item_master_xlsx_upload(file_bytes: bytes) -> List[Dict[str, Any]]:
+    """Parse an uploaded Item Master XLSX, trying the linear format first and then the pivoted one.
+
+    Module-level and bytes-in/list-out so it can run in a worker process.
+    """
+    try:
+        try:
+            parsed = parse_item_master_xlsx_bytes(file_bytes)
+            logger.debug("Parsed %d rows from XLSX (linear format)", len(parsed))
+        except Exception as e1:
+            logger.debug("Linear format failed: %s, trying pivoted...", e1)
+            parsed = parse_item_master_pivot_xlsx_bytes(file_bytes)
+            logger.debug("Parsed %d rows from XLSX (pivoted format)", len(parsed))
+    except StopIteration as e:
+        # asyncio cannot set StopIteration on the Future awaiting this worker,
+        # which would leave the request hanging
+        raise ValueError("XLSX sheet ended unexpectedly") from e
+    return parsed
+
+def _detach_when_done(text: io.TextIOWrapper, rows: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    try:
+        yield from rows
+    finally:
+        text.detach()
 
 def parse_item_master_xlsx_bytes(file_bytes: bytes) -> List[Dict[str, Any]]:
-    """Parse Item Master XLSX in memory to list of dicts expected by ItemParsed.
+    """Parse Item Master XLSX in memory to list of dicts expected by ItemParsed."""
+    return parse_item_master_xlsx_file(io.BytesIO(file_bytes))
+
+def parse_item_master_xlsx_file(fp: BinaryIO) -> List[Dict[str, Any]]:
+    """Parse an Item Master XLSX file object to list of dicts expected by ItemParsed.
     
+    Rows are read as plain values (see _iter_xlsx_rows) rather than as cell objects.
     Flexible header matching - accepts common synonyms and is case-insensitive.
     """
+    with closing(_iter_xlsx_rows(fp)) as rows:
+        return _parse_item_master_sheet(rows)
+
+def _iter_xlsx_rows(fp: BinaryIO) -> Iterator[Sequence[Any]]:
+    """Yield the worksheet's rows as sequences of values, starting from row 1, column A.
+
+    Every row is at least as wide as the header row.
+    Uses python-calamine when installed, otherwise openpyxl in read-only mode.
+    """
+    if CalamineWorkbook is not None:
+        wb = CalamineWorkbook.from_filelike(fp)
+        try:
+            rows = wb.get_sheet_by_index(0).to_python(skip_empty_area=False)
+        finally:
+            wb.close()
+        # calamine reports every number as float, openpyxl keeps whole numbers as int;
+        # match openpyxl so a numeric item code reads as "5", not "5.0"
+        for row in rows:
+            yield [int(v) if type(v) is float and v.is_integer() else v for v in row]
+        return
+
     if load_workbook is None:
         raise ImportError("openpyxl is not installed. Please add 'openpyxl' to requirements or install it.")
-    from io import BytesIO
-    wb = load_workbook(filename=BytesIO(file_bytes), data_only=True)
-    ws = wb.active
-    
+    wb = load_workbook(filename=fp, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.active
+        # Read-only iteration is bounded by the sheet's stored <dimension>, which some
+        # writers leave as A1:A1; drop it so rows and columns are read to the real end
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield header
+        # Without stored dimensions rows end at their last non-empty cell; pad them
+        # to the header width so empty trailing cells still read as None
+        width = len(header)
+        for row in rows:
+            yield tuple(row) + (None,) * (width - len(row)) if len(row) < width else row
+    finally:
+        wb.close()
+
+def _parse_item_master_sheet(rows: Iterator[Sequence[Any]]) -> List[Dict[str, Any]]:
     # Get headers from first row
-    headers_raw = [str(cell.value).strip() if cell.value else "" for cell in next(ws.iter_rows(min_row=1, max_row=1))]
-    print(f"DEBUG XLSX: Found {len(headers_raw)} headers: {headers_raw}")
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("XLSX sheet is empty")
+    headers_raw = [str(value).strip() if value else "" for value in header]
+    logger.debug("XLSX: found %d headers: %s", len(headers_raw), headers_raw)
     
     # Build case-insensitive header lookup
     norm = lambda s: str(s or "").strip().lower()
@@ -183,7 +325,7 @@ def parse_item_master_xlsx_bytes(file_bytes: bytes) -> List[Dict[str, Any]]:
             if synonym in norm_to_orig:
                 orig_header = norm_to_orig[synonym]
                 field_to_idx[field_name] = headers_raw.index(orig_header)
-                print(f"DEBUG XLSX: Matched '{field_name}' to column '{orig_header}' (index {field_to_idx[field_name]})")
+                logger.debug("XLSX: matched %r to column %r (index %d)", field_name, orig_header, field_to_idx[field_name])
                 break
     
     # Check we found all required fields
@@ -194,24 +336,17 @@ def parse_item_master_xlsx_bytes(file_bytes: bytes) -> List[Dict[str, Any]]:
     
     data: List[Dict[str, Any]] = []
     
-    def clean_str(value) -> str:
-        s = str(value).strip() if value else ""
-        return "" if s.lower() in ("none", "null", "-") else s
-    
-    def clean_unit(value) -> str | None:
-        s = str(value).strip() if value else ""
-        return None if s == "" or s.lower() in ("none", "null", "-") else s
-    
+    # Column positions are resolved once: each row is padded if the read-only
+    # sheet trimmed trailing empty cells, then unpacked with a single itemgetter
+    pick = itemgetter(*(field_to_idx[f] for f in required))
+    width = max(field_to_idx.values()) + 1
+
     # Parse data rows
-    for row_num, row in enumerate(ws.iter_rows(min_row=2), start=2):
+    for row_num, row in enumerate(rows, start=2):
         try:
-            # Extract values using the column indexes we found
-            div_val = row[field_to_idx["division"]].value if field_to_idx["division"] < len(row) else None
-            code_val = row[field_to_idx["item_code"]].value if field_to_idx["item_code"] < len(row) else None
-            desc_val = row[field_to_idx["item_description"]].value if field_to_idx["item_description"] < len(row) else None
-            unit_val = row[field_to_idx["unit"]].value if field_to_idx["unit"] < len(row) else None
-            rate_val = row[field_to_idx["rate"]].value if field_to_idx["rate"] < len(row) else None
-            region_val = row[field_to_idx["region"]].value if field_to_idx["region"] < len(row) else None
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            div_val, code_val, desc_val, unit_val, rate_val, region_val = pick(row)
             
             # Parse rate
             try:
@@ -219,13 +354,14 @@ def parse_item_master_xlsx_bytes(file_bytes: bytes) -> List[Dict[str, Any]]:
             except (ValueError, TypeError):
                 rate = None
             
+            unit = _clean_unit(unit_val)
             entry = {
-                "division": clean_str(div_val),
-                "item_code": clean_str(code_val),
-                "item_description": clean_str(desc_val),
-                "unit": clean_unit(unit_val),
+                "division": intern(_clean_str(div_val)),
+                "item_code": _clean_str(code_val),
+                "item_description": _clean_str(desc_val),
+                "unit": intern(unit) if unit else unit,
                 "rate": rate,
-                "region": clean_str(region_val),
+                "region": intern(_clean_str(region_val)),
             }
             
             # Skip empty rows
@@ -235,23 +371,29 @@ def parse_item_master_xlsx_bytes(file_bytes: bytes) -> List[Dict[str, Any]]:
             data.append(entry)
         except Exception as e:
             # Log but continue on row parsing errors
-            print(f"DEBUG XLSX: Error parsing row {row_num}: {e}")
+            logger.debug("XLSX: error parsing row %d: %s", row_num, e)
             continue
     
-    print(f"DEBUG XLSX: Successfully parsed {len(data)} rows from XLSX")
+    logger.debug("XLSX: parsed %d rows", len(data))
     return data
 
 def parse_item_master_pivot_xlsx_bytes(file_bytes: bytes) -> List[Dict[str, Any]]:
-    """Parse pivoted Item Master XLSX in memory to list of dicts expected by ItemParsed.
+    """Parse pivoted Item Master XLSX in memory to list of dicts expected by ItemParsed."""
+    return parse_item_master_pivot_xlsx_file(io.BytesIO(file_bytes))
+
+def parse_item_master_pivot_xlsx_file(fp: BinaryIO) -> List[Dict[str, Any]]:
+    """Parse a pivoted Item Master XLSX file object to list of dicts expected by ItemParsed.
 
     Flexible header parsing with case-insensitive synonyms and dynamic region columns.
     """
-    if load_workbook is None:
-        raise ImportError("openpyxl is not installed. Please add 'openpyxl' to requirements or install it.")
-    from io import BytesIO
-    wb = load_workbook(filename=BytesIO(file_bytes), data_only=True)
-    ws = wb.active
-    headers = [cell.value if cell.value is not None else "" for cell in next(ws.iter_rows(min_row=1, max_row=1))]
+    with closing(_iter_xlsx_rows(fp)) as rows:
+        return _parse_item_master_pivot_sheet(rows)
+
+def _parse_item_master_pivot_sheet(rows: Iterator[Sequence[Any]]) -> List[Dict[str, Any]]:
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("XLSX sheet is empty")
+    headers = [value if value is not None else "" for value in header]
     header_index = {str(h).strip(): idx for idx, h in enumerate(headers)}
     # Build normalized lookup for synonyms
     norm = lambda s: str(s or "").strip().lower()
@@ -334,33 +476,26 @@ def parse_item_master_pivot_xlsx_bytes(file_bytes: bytes) -> List[Dict[str, Any]
             col_idx_to_regions[idx] = regions_for_col
 
     data: List[Dict[str, Any]] = []
-    def clean_str(value) -> str:
-        s = str(value).strip() if value is not None else ""
-        return "" if s.lower() in ("none", "null", "-") else s
+    # Resolved once from the header; rows from _iter_xlsx_rows are at least as wide
+    # as the header, so every slot can be indexed directly
+    region_slots = list(col_idx_to_regions.items())
 
-    def clean_unit(value) -> str | None:
-        s = str(value).strip() if value is not None else ""
-        return None if s == "" or s.lower() in ("none", "null", "-") else s
-
-    for row in ws.iter_rows(min_row=2):
+    for row in rows:
         # Extract base values
-        division = clean_str(row[idx_division].value if idx_division is not None else None)
-        item_code = clean_str(row[idx_item_code].value if idx_item_code is not None else None)
-        description = clean_str(row[idx_description].value if idx_description is not None else None)
-        unit_cell = row[idx_unit] if idx_unit is not None else None
-        unit = clean_unit(unit_cell.value if unit_cell else None)
-        org_cell = row[idx_org] if idx_org is not None else None
-        organization = clean_str(org_cell.value if org_cell else None)
+        division = intern(_clean_str(row[idx_division]))
+        item_code = _clean_str(row[idx_item_code])
+        description = _clean_str(row[idx_description])
+        unit = _clean_unit(row[idx_unit])
+        if unit:
+            unit = intern(unit)
+        organization = intern(_clean_str(row[idx_org] if idx_org is not None else None))
 
         if not item_code and not description:
             continue
 
         # Iterate over region columns
-        for col_idx, region_list in col_idx_to_regions.items():
-            if col_idx >= len(row): continue
-            
-            rate_cell = row[col_idx]
-            rate_val = rate_cell.value if rate_cell else None
+        for col_idx, region_list in region_slots:
+            rate_val = row[col_idx]
             
             rate = None
             if rate_val not in (None, "-", ""):
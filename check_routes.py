@@ -1,14 +1,37 @@
-from app import main
-
-print('App imported successfully')
-print('Routes registered:')
-auth_routes = []
-for route in main.app.routes:
-    path = getattr(route, 'path', 'N/A')
-    methods = getattr(route, 'methods', 'N/A')
-    print(f'  {path} - {methods}')
-    if '/auth' in str(path):
-        auth_routes.append(path)
-
-print(f'\nTotal auth routes found: {len(auth_routes)}')
-print('Auth routes:', auth_routes)
+from collections import Counter
+
+def iter_routes(routes):
+    # Newer FastAPI keeps included routers as a single entry wrapping the original router
+    for route in routes:
+        included = getattr(route, 'original_router', None)
+        if included is not None:
+            yield from iter_routes(included.routes)
+        else:
+            yield route
+
+def main():
+    from app.main import app
+
+    print('App imported successfully')
+    print('Routes registered:')
+    auth_routes = []
+    seen = Counter()
+    for route in iter_routes(app.routes):
+        path = getattr(route, 'path', 'N/A')
+        methods = getattr(route, 'methods', 'N/A')
+        print(f'  {path} - {methods}')
+        for method in methods or ():
+            seen[(method, path)] += 1
+        if '/auth' in str(path):
+            auth_routes.append(path)
+
+    print(f'\nTotal auth routes found: {len(auth_routes)}')
+    print('Auth routes:', auth_routes)
+
+    duplicates = [f'{method} {path}' for (method, path), n in seen.items() if n > 1]
+    if duplicates:
+        raise SystemExit(f'Duplicate routes registered: {duplicates}')
+    print('No duplicate routes')
+
+if __name__ == '__main__':
+    main()
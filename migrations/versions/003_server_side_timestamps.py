@@ -0,0 +1,43 @@
+"""Generate created_at/updated_at timestamps in the database
+
+Revision ID: 003_server_side_timestamps
+Revises: 1a41bf5af789
+Create Date: 2026-10-15 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_server_side_timestamps'
+down_revision: Union[str, None] = '1a41bf5af789'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UTC_NOW = sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)")
+
+TIMESTAMP_COLUMNS = [
+    ('roles', 'created_at'),
+    ('users', 'created_at'),
+    ('users', 'updated_at'),
+    ('special_items', 'created_at'),
+    ('projects', 'created_at'),
+    ('projects', 'updated_at'),
+    ('estimations', 'created_at'),
+    ('estimations', 'updated_at'),
+    ('special_item_requests', 'created_at'),
+]
+
+
+def upgrade() -> None:
+    # Let the database fill timestamps instead of binding a Python datetime per row
+    for table, column in TIMESTAMP_COLUMNS:
+        op.alter_column(table, column, server_default=UTC_NOW)
+
+
+def downgrade() -> None:
+    for table, column in TIMESTAMP_COLUMNS:
+        op.alter_column(table, column, server_default=None)
@@ -0,0 +1,42 @@
+"""Add indexes for estimation and special item request lookups
+
+Revision ID: 004_add_estimation_indexes
+Revises: 003_server_side_timestamps
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_add_estimation_indexes'
+down_revision: Union[str, None] = '003_server_side_timestamps'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Lines are always listed/summed per estimation
+    op.create_index('idx_estimation_lines_estimation_id', 'estimation_lines', ['estimation_id'], unique=False)
+
+    # Estimations are listed per project and checked against their creator
+    op.create_index('idx_estimations_project_id', 'estimations', ['project_id'], unique=False)
+    op.create_index('idx_estimations_created_by_id', 'estimations', ['created_by_id'], unique=False)
+
+    # Special item request lists filter by estimation or requester, optionally by status
+    op.create_index('idx_special_item_requests_estimation_status', 'special_item_requests',
+                    ['estimation_id', 'status'], unique=False)
+    op.create_index('idx_special_item_requests_requested_by_status', 'special_item_requests',
+                    ['requested_by_id', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    # Drop all indexes created in upgrade
+    op.drop_index('idx_special_item_requests_requested_by_status', table_name='special_item_requests')
+    op.drop_index('idx_special_item_requests_estimation_status', table_name='special_item_requests')
+    op.drop_index('idx_estimations_created_by_id', table_name='estimations')
+    op.drop_index('idx_estimations_project_id', table_name='estimations')
+    op.drop_index('idx_estimation_lines_estimation_id', table_name='estimation_lines')
@@ -0,0 +1,32 @@
+"""Track when item master rows change
+
+Revision ID: 005_add_items_updated_at
+Revises: 004_add_estimation_indexes
+Create Date: 2026-10-15 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_add_items_updated_at'
+down_revision: Union[str, None] = '004_add_estimation_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UTC_NOW = sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)")
+
+
+def upgrade() -> None:
+    # Existing rows are stamped with the migration time by the server default
+    op.add_column('items', sa.Column('updated_at', sa.DateTime(), server_default=UTC_NOW, nullable=False))
+    # Exports read MAX(updated_at) on every request
+    op.create_index('idx_items_updated_at', 'items', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_items_updated_at', table_name='items')
+    op.drop_column('items', 'updated_at')
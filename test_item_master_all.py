@@ -11,6 +11,8 @@ import requests
 import io
 
 BASE_URL = "http://localhost:8000"
+# One keep-alive connection for every call instead of a new one per request
+session = requests.Session()
 
 def test_organizations():
     """Test organization CRUD"""
@@ -20,7 +22,7 @@ def test_organizations():
     
     # 1. Create organization
     print("\n1. Creating organization...")
-    resp = requests.post(f"{BASE_URL}/orgs", json={"name": "Test Org"})
+    resp = session.post(f"{BASE_URL}/orgs", json={"name": "Test Org"})
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         org = resp.json()
@@ -32,7 +34,7 @@ def test_organizations():
     
     # 2. List organizations
     print("\n2. Listing organizations...")
-    resp = requests.get(f"{BASE_URL}/orgs")
+    resp = session.get(f"{BASE_URL}/orgs")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         orgs = resp.json()
@@ -44,7 +46,7 @@ def test_organizations():
     
     # 3. Update organization
     print("\n3. Updating organization...")
-    resp = requests.patch(f"{BASE_URL}/orgs/{org_id}", json={"name": "Test Org Updated"})
+    resp = session.patch(f"{BASE_URL}/orgs/{org_id}", json={"name": "Test Org Updated"})
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         org = resp.json()
@@ -62,7 +64,7 @@ def test_regions(org_id):
     
     # 1. Create region
     print("\n1. Creating region...")
-    resp = requests.post(f"{BASE_URL}/orgs/{org_id}/regions", json={"name": "Test Zone"})
+    resp = session.post(f"{BASE_URL}/orgs/{org_id}/regions", json={"name": "Test Zone"})
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         region = resp.json()
@@ -74,7 +76,7 @@ def test_regions(org_id):
     
     # 2. List regions
     print("\n2. Listing regions...")
-    resp = requests.get(f"{BASE_URL}/orgs/{org_id}/regions")
+    resp = session.get(f"{BASE_URL}/orgs/{org_id}/regions")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         regions = resp.json()
@@ -86,7 +88,7 @@ def test_regions(org_id):
     
     # 3. Update region
     print("\n3. Updating region...")
-    resp = requests.patch(f"{BASE_URL}/orgs/regions/{region_id}", json={"name": "Test Zone Updated"})
+    resp = session.patch(f"{BASE_URL}/orgs/regions/{region_id}", json={"name": "Test Zone Updated"})
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         region = resp.json()
@@ -104,7 +106,7 @@ def test_divisions(org_id):
     
     # 1. Create division
     print("\n1. Creating division...")
-    resp = requests.post(f"{BASE_URL}/items/divisions", json={
+    resp = session.post(f"{BASE_URL}/items/divisions", json={
         "name": "Test Division",
         "organization_id": org_id
     })
@@ -119,7 +121,7 @@ def test_divisions(org_id):
     
     # 2. List divisions
     print("\n2. Listing divisions...")
-    resp = requests.get(f"{BASE_URL}/items/divisions")
+    resp = session.get(f"{BASE_URL}/items/divisions")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         divisions = resp.json()
@@ -139,7 +141,7 @@ def test_items(division_id):
     
     # 1. Create item
     print("\n1. Creating item...")
-    resp = requests.post(f"{BASE_URL}/items", json={
+    resp = session.post(f"{BASE_URL}/items", json={
         "division_id": division_id,
         "item_code": "TEST001",
         "item_description": "Test Item",
@@ -159,7 +161,7 @@ def test_items(division_id):
     
     # 2. List items
     print("\n2. Listing items...")
-    resp = requests.get(f"{BASE_URL}/items")
+    resp = session.get(f"{BASE_URL}/items")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         items = resp.json()
@@ -171,7 +173,7 @@ def test_items(division_id):
     
     # 3. Update item
     print("\n3. Updating item...")
-    resp = requests.put(f"{BASE_URL}/items/{item_id}", json={
+    resp = session.put(f"{BASE_URL}/items/{item_id}", json={
         "item_description": "Test Item Updated",
         "rate": 150.75
     })
@@ -201,7 +203,7 @@ General,IMPORT003,Imported Item 3,pc,100.00,Sylhet Zone
     csv_file = io.BytesIO(test_csv.encode('utf-8'))
     files = {'file': ('test_import.csv', csv_file, 'text/csv')}
     
-    resp = requests.post(f"{BASE_URL}/items/import?mode=append", files=files)
+    resp = session.post(f"{BASE_URL}/items/import?mode=append", files=files)
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         result = resp.json()
@@ -215,7 +217,7 @@ General,IMPORT003,Imported Item 3,pc,100.00,Sylhet Zone
     
     # Verify imported items
     print("\n2. Verifying imported items...")
-    resp = requests.get(f"{BASE_URL}/items")
+    resp = session.get(f"{BASE_URL}/items")
     if resp.status_code == 200:
         items = resp.json()
         imported = [i for i in items if i['item_code'].startswith('IMPORT')]
@@ -223,6 +225,21 @@ General,IMPORT003,Imported Item 3,pc,100.00,Sylhet Zone
         for i in imported:
             print(f"     - {i['item_code']}: {i['item_description']}")
 
+    # An empty workbook must be rejected, not leave the request hanging
+    print("\n3. Importing an empty XLSX...")
+    from openpyxl import Workbook
+    xlsx_file = io.BytesIO()
+    Workbook().save(xlsx_file)
+    xlsx_file.seek(0)
+    files = {'file': ('empty.xlsx', xlsx_file,
+                      'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+    resp = session.post(f"{BASE_URL}/items/import?mode=append", files=files, timeout=30)
+    print(f"   Status: {resp.status_code}")
+    if resp.status_code == 400:
+        print(f"   ✓ Rejected: {resp.json().get('detail')}")
+    else:
+        print(f"   ✗ Expected 400: {resp.text}")
+
 def test_export():
     """Test export functionality"""
     print("\n" + "="*60)
@@ -231,7 +248,7 @@ def test_export():
     
     # 1. Export CSV
     print("\n1. Exporting items as CSV...")
-    resp = requests.get(f"{BASE_URL}/items/export.csv")
+    resp = session.get(f"{BASE_URL}/items/export.csv")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         content_length = len(resp.content)
@@ -246,7 +263,7 @@ def test_export():
     
     # 2. Export XLSX
     print("\n2. Exporting items as XLSX...")
-    resp = requests.get(f"{BASE_URL}/items/export.xlsx")
+    resp = session.get(f"{BASE_URL}/items/export.xlsx")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         content_length = len(resp.content)
@@ -262,7 +279,7 @@ def test_delete(item_id, division_id, region_id, org_id):
     
     # 1. Delete item
     print("\n1. Deleting item...")
-    resp = requests.delete(f"{BASE_URL}/items/{item_id}")
+    resp = session.delete(f"{BASE_URL}/items/{item_id}")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         item = resp.json()
@@ -272,7 +289,7 @@ def test_delete(item_id, division_id, region_id, org_id):
     
     # 2. Delete division
     print("\n2. Deleting division...")
-    resp = requests.delete(f"{BASE_URL}/items/divisions/{division_id}")
+    resp = session.delete(f"{BASE_URL}/items/divisions/{division_id}")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         division = resp.json()
@@ -282,7 +299,7 @@ def test_delete(item_id, division_id, region_id, org_id):
     
     # 3. Delete region
     print("\n3. Deleting region...")
-    resp = requests.delete(f"{BASE_URL}/orgs/regions/{region_id}")
+    resp = session.delete(f"{BASE_URL}/orgs/regions/{region_id}")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         region = resp.json()
@@ -292,7 +309,7 @@ def test_delete(item_id, division_id, region_id, org_id):
     
     # 4. Delete organization
     print("\n4. Deleting organization...")
-    resp = requests.delete(f"{BASE_URL}/orgs/{org_id}")
+    resp = session.delete(f"{BASE_URL}/orgs/{org_id}")
     print(f"   Status: {resp.status_code}")
     if resp.status_code == 200:
         org = resp.json()